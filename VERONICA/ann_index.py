@@ -0,0 +1,220 @@
+"""
+Approximate nearest-neighbour (IVF) index for the local vector store
+"""
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+IVF_DIR = "ivf"
+IVF_MANIFEST_FILE = "ivf.json"
+CENTROIDS_FILE = "centroids.f32"
+ASSIGNMENTS_FILE = "assignments.i32"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 10000) -> np.ndarray:
+    """Nearest centroid for each vector, scoring batch_size vectors at a time"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = _normalize(np.asarray(vectors[start:start + batch_size], dtype=np.float32))
+        labels[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    """
+    Inverted-file index over a snapshot's memory-mapped vectors
+    
+    Vectors are clustered around `nlist` centroids (spherical k-means) and
+    every row is assigned to its nearest centroid. A query only scores rows
+    in the `nprobe` closest lists, trading recall for latency. Inserts are
+    assigned to the existing centroids; deletes drop rows from their list.
+    The index stores only centroids and row assignments, the vectors stay in
+    the snapshot. `trained_count` is the number of live rows the centroids
+    were trained on, so callers can retrain once the data has outgrown them.
+    `snapshot_id` ties the row assignments to one snapshot; a rewritten
+    (compacted) snapshot has a new id and needs a new index.
+    """
+    
+    def __init__(self, path: str, centroids: np.ndarray, assignments: np.ndarray, trained_count: int = 0,
+                 snapshot_id: str = None):
+        self.path = path
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_count = trained_count
+        self.snapshot_id = snapshot_id
+        self._lists = None
+    
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+    
+    @staticmethod
+    def exists(snapshot_path: str) -> bool:
+        return os.path.exists(os.path.join(snapshot_path, IVF_DIR, IVF_MANIFEST_FILE))
+    
+    @classmethod
+    def load(cls, snapshot_path: str) -> "IVFIndex":
+        path = os.path.join(snapshot_path, IVF_DIR)
+        with open(os.path.join(path, IVF_MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        centroids = np.fromfile(os.path.join(path, CENTROIDS_FILE), dtype=np.float32)
+        centroids = centroids.reshape(manifest["nlist"], manifest["dimension"])
+        assignments = np.fromfile(os.path.join(path, ASSIGNMENTS_FILE), dtype=np.int32)
+        return cls(path, centroids, assignments, manifest.get("trained_count", manifest["count"]),
+                   manifest.get("snapshot_id"))
+    
+    @classmethod
+    def train(cls, snapshot_path: str, vectors: np.ndarray, nlist: int = None,
+              iterations: int = 10, sample_size: int = 100000, live_mask: np.ndarray = None,
+              snapshot_id: str = None) -> "IVFIndex":
+        """
+        Cluster the vectors and assign every row to a list
+        
+        Args:
+            snapshot_path: Snapshot directory the index belongs to
+            vectors: (count x dimension) vectors, typically the snapshot memmap
+            nlist: Number of lists (default: 4 * sqrt(count))
+            iterations: k-means iterations
+            sample_size: Rows sampled for training (raised to at least 40 * nlist)
+            live_mask: Boolean mask of non-deleted rows
+            snapshot_id: ID from the snapshot manifest
+            
+        Returns:
+            Trained and saved IVFIndex
+        """
+        live_rows = np.flatnonzero(live_mask) if live_mask is not None else np.arange(len(vectors))
+        count = len(live_rows)
+        nlist = nlist or max(1, int(4 * np.sqrt(count)))
+        nlist = min(nlist, count)
+        # k-means needs tens of points per centroid to place it well
+        sample_size = max(sample_size, 40 * nlist)
+        
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(live_rows, size=min(sample_size, count), replace=False))
+        sample = _normalize(np.asarray(vectors[sample_rows], dtype=np.float32))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        
+        for _ in range(iterations):
+            labels = _nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            sizes = np.bincount(labels, minlength=nlist)
+            empty = sizes == 0
+            centroids = sums / np.maximum(sizes, 1)[:, None]
+            # Re-seed empty clusters with random samples
+            centroids[empty] = sample[rng.integers(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(centroids)
+        
+        index = cls(os.path.join(snapshot_path, IVF_DIR), centroids.astype(np.float32),
+                    np.zeros(0, dtype=np.int32), trained_count=count, snapshot_id=snapshot_id)
+        index.add(vectors, start_row=0)
+        if live_mask is not None:
+            index.delete(np.flatnonzero(~live_mask))
+        index.save()
+        return index
+    
+    def assign(self, vectors: np.ndarray, batch_size: int = 10000) -> np.ndarray:
+        """Nearest-centroid list for each vector"""
+        return _nearest(vectors, self.centroids, batch_size)
+    
+    def add(self, vectors: np.ndarray, start_row: int):
+        """Assign rows start_row .. start_row + len(vectors) to lists"""
+        if start_row != len(self.assignments):
+            raise ValueError(f"IVF index covers {len(self.assignments)} rows, cannot add at row {start_row}")
+        self.assignments = np.concatenate([self.assignments, self.assign(vectors)])
+        self._lists = None
+    
+    def delete(self, rows):
+        """Remove rows from their lists"""
+        self.assignments[np.asarray(rows, dtype=np.int64)] = -1
+        self._lists = None
+    
+    def _build_lists(self):
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.nlist + 1))
+        self._lists = (order, bounds)
+    
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows in the nprobe lists closest to the query"""
+        if self._lists is None:
+            self._build_lists()
+        order, bounds = self._lists
+        
+        nprobe = min(nprobe, self.nlist)
+        centroid_scores = self.centroids @ _normalize(query)
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes]))
+    
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.centroids.astype(np.float32).tofile(os.path.join(self.path, CENTROIDS_FILE))
+        self.assignments.astype(np.int32).tofile(os.path.join(self.path, ASSIGNMENTS_FILE))
+        with open(os.path.join(self.path, IVF_MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "nlist": self.nlist,
+                "dimension": int(self.centroids.shape[1]),
+                "count": int(len(self.assignments)),
+                "trained_count": int(self.trained_count),
+                "snapshot_id": self.snapshot_id,
+            }, f, indent=2)
+
+
+def evaluate_recall(store, queries: np.ndarray, k: int = 4,
+                    nprobe_values: Optional[List[int]] = None,
+                    query_rows: Optional[np.ndarray] = None) -> List[dict]:
+    """
+    Measure recall@k and latency of ANN search against exact search
+    
+    Args:
+        store: LocalVectorStore with a trained IVF index
+        queries: (n x dimension) query vectors
+        k: Number of neighbours
+        nprobe_values: nprobe settings to evaluate
+        query_rows: Snapshot row of each query when queries are stored vectors;
+            that row is left out of both result sets, since the IVF list of a
+            stored vector always contains it and would inflate recall
+        
+    Returns:
+        One row per setting (exact search first) with recall and p50/p99 latency in ms
+    """
+    nprobe_values = nprobe_values or [1, 2, 4, 8, 16, 32]
+    
+    def run(**search_kwargs) -> Tuple[List[set], np.ndarray]:
+        found, latencies = [], []
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            if query_rows is None:
+                rows, _ = store.search_rows(query, k, **search_kwargs)
+            else:
+                rows, _ = store.search_rows(query, k + 1, **search_kwargs)
+                rows = rows[rows != query_rows[i]][:k]
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append(set(rows.tolist()))
+        return found, np.asarray(latencies)
+    
+    exact, exact_latencies = run(exact=True)
+    results = [{
+        "setting": "exact",
+        "recall": 1.0,
+        "p50_ms": float(np.percentile(exact_latencies, 50)),
+        "p99_ms": float(np.percentile(exact_latencies, 99)),
+    }]
+    for nprobe in nprobe_values:
+        found, latencies = run(nprobe=nprobe)
+        hits = sum(len(f & e) for f, e in zip(found, exact))
+        total = sum(len(e) for e in exact)
+        results.append({
+            "setting": f"nprobe={nprobe}",
+            "recall": hits / total if total else 1.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+        })
+    return results
@@ -30,6 +30,67 @@ def initialize_components():
         st.session_state.llm_manager = LLMManager()
         st.session_state.initialized = True
 
+def compact_sources(documents):
+    """Keep only a reference (chunk ID, source, page, score) for each source document"""
+    refs = []
+    for doc in documents:
+        chunk_id = doc.metadata.get("chunk_id") or doc.metadata.get("id")
+        ref = {
+            "id": chunk_id,
+            "source": doc.metadata.get("source", "Unknown"),
+            "page": doc.metadata.get("page"),
+            "score": doc.metadata.get("score"),
+        }
+        if not chunk_id:
+            # Chunks ingested before IDs were recorded cannot be re-fetched
+            ref["excerpt"] = doc.page_content[:200]
+        refs.append(ref)
+    return refs
+
+def render_source_refs(refs, key):
+    """Show source references; chunk text is fetched from the store only when toggled on"""
+    if not st.toggle(f"📚 Source Documents ({len(refs)})", key=key):
+        return
+    
+    chunks = st.session_state.vector_store.get_chunks([ref["id"] for ref in refs if ref["id"]])
+    for i, ref in enumerate(refs, 1):
+        details = [ref["source"]]
+        if ref.get("page") is not None:
+            details.append(f"page {ref['page']}")
+        if ref.get("score") is not None:
+            details.append(f"score {ref['score']:.2f}")
+        st.markdown(f"**Source {i}:** {' · '.join(details)}")
+        
+        chunk = chunks.get(ref["id"]) if ref["id"] else None
+        excerpt = chunk.page_content[:200] if chunk else ref.get("excerpt", "(chunk no longer in the vector store)")
+        st.text(excerpt + "...")
+
+def render_chat_history():
+    """Render one page of the chat history (the newest page by default)"""
+    messages = st.session_state.messages
+    page_size = Config.CHAT_PAGE_SIZE
+    pages = max(1, (len(messages) + page_size - 1) // page_size)
+    # Page 0 is the newest; higher numbers go back in time
+    page = min(st.session_state.get("chat_page", 0), pages - 1)
+    
+    if pages > 1:
+        older, position, newer = st.columns([1, 2, 1])
+        if older.button("⬆️ Older", disabled=page >= pages - 1):
+            page += 1
+        if newer.button("⬇️ Newer", disabled=page == 0):
+            page -= 1
+        st.session_state.chat_page = page
+        position.caption(f"Page {pages - page} of {pages}")
+    
+    end = len(messages) - page * page_size
+    start = max(0, end - page_size)
+    for index in range(start, end):
+        message = messages[index]
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            if message.get("sources"):
+                render_source_refs(message["sources"], key=f"sources_{index}")
+
 def main():
     """Main application"""
     initialize_components()
@@ -50,29 +111,34 @@ def main():
         )
         auto_process = st.checkbox("Auto-process uploads", value=True, help="Automatically process files as soon as they are uploaded.")
         
-        # Auto-process newly uploaded files by detecting a change in the upload signature
+        # Spool uploads to content-addressed storage (hashed once per upload, cached across reruns)
         try:
-            current_sig = tuple((f.name, len(f.getbuffer())) for f in (uploaded_files or []))
-        except Exception:
-            current_sig = tuple((f.name, 0) for f in (uploaded_files or []))
-
-        if auto_process and uploaded_files and (current_sig != st.session_state.get("_last_upload_sig")):
+            spooled_files = [
+                st.session_state.doc_processor.spool_upload(f, f.name)
+                for f in (uploaded_files or [])
+            ]
+        except Exception as e:
+            spooled_files = []
+            st.error(f"Error saving uploads: {str(e)}")
+        
+        # Auto-process newly uploaded files by detecting a change in the upload signature
+        current_sig = tuple((s["name"], s["size"], s["sha256"]) for s in spooled_files)
+        
+        if auto_process and spooled_files and (current_sig != st.session_state.get("_last_upload_sig")):
             st.session_state["_last_upload_sig"] = current_sig
             with st.spinner("Processing documents..."):
                 try:
                     all_documents = []
-                    for uploaded_file in uploaded_files:
-                        # Save file
-                        file_path = st.session_state.doc_processor.save_uploaded_file(
-                            uploaded_file,
-                            uploaded_file.name
+                    for spooled in spooled_files:
+                        # Process document from the spooled file
+                        documents = st.session_state.doc_processor.process_document(
+                            spooled["path"],
+                            source_name=spooled["name"],
+                            file_hash=spooled["sha256"]
                         )
-
-                        # Process document
-                        documents = st.session_state.doc_processor.process_document(file_path)
                         all_documents.extend(documents)
-                        st.success(f"✅ Processed: {uploaded_file.name}")
-
+                        st.success(f"✅ Processed: {spooled['name']}")
+                    
                     # Add to vector store
                     st.session_state.vector_store.add_documents(all_documents)
 
@@ -83,27 +149,29 @@ def main():
                     st.session_state.documents_processed = True
                     st.success(f"🎉 Successfully processed {len(uploaded_files)} document(s)!")
                     st.info(f"Total chunks created: {len(all_documents)}")
+                    dedup_report = st.session_state.vector_store.last_dedup_report
+                    if dedup_report and dedup_report["unique_chunks"] < dedup_report["input_chunks"]:
+                        skipped = dedup_report["input_chunks"] - dedup_report["unique_chunks"]
+                        st.info(f"♻️ Skipped {skipped} duplicate chunks (~{dedup_report['embedding_seconds_saved']:.1f}s of embedding saved)")
                 except Exception as e:
                     st.error(f"Error processing documents: {str(e)}")
 
         if st.button("Process Documents", type="primary"):
-            if uploaded_files:
+            if spooled_files:
                 with st.spinner("Processing documents..."):
                     try:
                         all_documents = []
                         
-                        for uploaded_file in uploaded_files:
-                            # Save file
-                            file_path = st.session_state.doc_processor.save_uploaded_file(
-                                uploaded_file, 
-                                uploaded_file.name
+                        for spooled in spooled_files:
+                            # Process document from the spooled file
+                            documents = st.session_state.doc_processor.process_document(
+                                spooled["path"],
+                                source_name=spooled["name"],
+                                file_hash=spooled["sha256"]
                             )
-                            
-                            # Process document
-                            documents = st.session_state.doc_processor.process_document(file_path)
                             all_documents.extend(documents)
                             
-                            st.success(f"✅ Processed: {uploaded_file.name}")
+                            st.success(f"✅ Processed: {spooled['name']}")
                         
                         # Add to vector store
                         st.session_state.vector_store.add_documents(all_documents)
@@ -115,7 +183,11 @@ def main():
                         st.session_state.documents_processed = True
                         st.success(f"🎉 Successfully processed {len(uploaded_files)} document(s)!")
                         st.info(f"Total chunks created: {len(all_documents)}")
-                        
+                        dedup_report = st.session_state.vector_store.last_dedup_report
+                        if dedup_report and dedup_report["unique_chunks"] < dedup_report["input_chunks"]:
+                            skipped = dedup_report["input_chunks"] - dedup_report["unique_chunks"]
+                            st.info(f"♻️ Skipped {skipped} duplicate chunks (~{dedup_report['embedding_seconds_saved']:.1f}s of embedding saved)")
+                            
                     except Exception as e:
                         st.error(f"Error processing documents: {str(e)}")
             else:
@@ -138,6 +210,7 @@ def main():
         if st.button("Reset Conversation"):
             st.session_state.llm_manager.reset_conversation()
             st.session_state.messages = []
+            st.session_state.chat_page = 0
             st.success("Conversation reset!")
         
         st.divider()
@@ -146,25 +219,27 @@ def main():
         st.header("📊 Status")
         st.write(f"LLM Model: {Config.OLLAMA_MODEL}")
         st.write(f"Documents Processed: {'✅' if st.session_state.documents_processed else '❌'}")
-        st.write(f"Vector Store: {'✅ Connected' if st.session_state.vector_store.pc else '❌ Not Connected'}")
+        st.write(f"Vector Store: {'✅ Connected' if st.session_state.vector_store.is_connected() else '❌ Not Connected'} ({Config.VECTOR_STORE_BACKEND})")
+        
+        # Per-endpoint stats when load-balancing across several Ollama servers
+        backend_stats = st.session_state.llm_manager.get_backend_stats()
+        if backend_stats:
+            with st.expander("🖥️ Ollama Backends"):
+                for ep in backend_stats:
+                    latency = f"{ep['latency_p50']:.2f}s p50 / {ep['latency_p95']:.2f}s p95" if ep['latency_p50'] is not None else "no data"
+                    st.write(f"{'✅' if ep['healthy'] else '❌'} {ep['base_url']} — {ep['in_flight']}/{ep['max_concurrency']} in flight, {ep['requests']} requests, {ep['errors']} errors, {latency}")
     
     # Main chat interface
     if st.session_state.documents_processed:
         st.markdown("### 💬 Ask Questions About Your Documents")
         
         # Display chat messages
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-                if "sources" in message and message["sources"]:
-                    with st.expander("📚 Source Documents"):
-                        for i, source in enumerate(message["sources"], 1):
-                            st.markdown(f"**Source {i}:** {source.metadata.get('source', 'Unknown')}")
-                            st.text(source.page_content[:200] + "...")
+        render_chat_history()
         
         # Chat input
         if prompt := st.chat_input("Ask a question about your documents..."):
-            # Add user message
+            # Add user message and jump back to the newest page
+            st.session_state.chat_page = 0
             st.session_state.messages.append({"role": "user", "content": prompt})
             with st.chat_message("user"):
                 st.markdown(prompt)
@@ -184,11 +259,11 @@ def main():
                                 st.markdown(f"**Source {i}:** {source.metadata.get('source', 'Unknown')}")
                                 st.text(source.page_content[:200] + "...")
                     
-                    # Add assistant message
+                    # Add assistant message (compact source references only)
                     st.session_state.messages.append({
                         "role": "assistant",
                         "content": answer,
-                        "sources": sources
+                        "sources": compact_sources(sources)
                     })
     else:
         st.info("👈 Please upload and process documents from the sidebar to start chatting!")
@@ -18,21 +18,76 @@ class Config:
     # Ollama Configuration (Local LLM)
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # Comma-separated list of Ollama servers to load-balance across
+    OLLAMA_BASE_URLS = [
+        url.strip() for url in os.getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",") if url.strip()
+    ]
+    OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))  # per endpoint
+    OLLAMA_HEALTH_CHECK_INTERVAL = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "10"))
+    OLLAMA_HEALTH_CHECK_TIMEOUT = 2.0
+    OLLAMA_FAILURE_THRESHOLD = 3  # consecutive failures before an endpoint is ejected
+    OLLAMA_EJECT_BACKOFF = 30.0  # seconds before an endpoint ejected for failed requests may rejoin (doubles per repeat)
+    OLLAMA_EJECT_BACKOFF_MAX = 600.0
+    OLLAMA_LATENCY_WINDOW = 500  # recent requests kept for latency stats
+    
+    # Question Answering
+    # Retrieve with the raw question while the follow-up is being condensed
+    QA_SPECULATIVE_RETRIEVAL = os.getenv("QA_SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+    # Minimum similarity between raw and condensed question to keep speculative results
+    QA_REWRITE_SIMILARITY_THRESHOLD = float(os.getenv("QA_REWRITE_SIMILARITY_THRESHOLD", "0.85"))
     
     # Document Processing
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
     
+    # Chat UI
+    CHAT_PAGE_SIZE = 20  # messages rendered per history page
+    CHUNK_CACHE_SIZE = 256  # resolved source chunks kept in memory
+    
     # Paths
     UPLOAD_DIR = "uploads"
     VECTORSTORE_DIR = "vectorstore"
+    UPLOAD_BLOCK_SIZE = 1024 * 1024  # bytes read per block when spooling uploads
+    
+    # Extracted page text cache (skips re-parsing unchanged files)
+    EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_DIR = os.path.join(VECTORSTORE_DIR, "extraction_cache")
+    EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+    
+    # Vector Store Backend ("pinecone" or "local")
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+    # Snapshot directory opened in place by the local backend
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(VECTORSTORE_DIR, "local"))
+    # Local index type: "flat" (exact search) or "ivf" (approximate, on-disk inverted lists)
+    LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "flat").lower()
+    ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # 0 = 4 * sqrt(vector count)
+    ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))  # lists scanned per query (recall/latency knob)
+    ANN_MIN_TRAIN_SIZE = 1000  # scripts/evaluate_ann.py only builds an index once this many vectors exist
+    ANN_RETRAIN_GROWTH = 4  # scripts/evaluate_ann.py retrains once live vectors exceed this multiple of the training count
     
     # Embeddings
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIMENSION = 384  # Dimension for all-MiniLM-L6-v2
+    # Shared embedding service (Unix socket path, or tcp://host:port); used when a server is listening
+    EMBEDDING_SERVICE_ADDRESS = os.getenv("EMBEDDING_SERVICE_ADDRESS", os.path.join(VECTORSTORE_DIR, "embeddings.sock"))
+    EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+    EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))  # micro-batching window
+    EMBEDDING_PRIORITY_MAX_TEXTS = 16  # requests this small (queries) are batched ahead of bulk ingests
+    EMBEDDING_TIMEOUT_PER_TEXT = 0.25  # seconds added to the client timeout per text in an embed request
+    
+    # Near-duplicate chunk elimination (MinHash + LSH) before embedding
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    DEDUP_INDEX_DIR = os.path.join(VECTORSTORE_DIR, "dedup")  # one subdirectory per vector index
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+    DEDUP_NUM_PERM = 64
+    DEDUP_BANDS = 8
+    DEDUP_SHINGLE_SIZE = 5  # words per shingle
     
     @classmethod
     def validate(cls):
         """Validate required configuration"""
+        if cls.VECTOR_STORE_BACKEND == "local":
+            return True
         if not cls.PINECONE_API_KEY:
             print("Warning: PINECONE_API_KEY not set. Please configure .env file.")
         if not cls.PINECONE_ENVIRONMENT:
@@ -0,0 +1,249 @@
+"""
+Near-duplicate chunk detection with MinHash + LSH
+"""
+import json
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from langchain.schema import Document
+from config import Config
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+ENTRIES_FILE = "entries.jsonl"
+
+
+class ChunkDeduplicator:
+    """
+    Detect near-duplicate chunks before they are embedded
+    
+    Every chunk gets a MinHash signature over its word shingles; signatures
+    are split into LSH bands so candidate duplicates are found without
+    comparing against every stored chunk. A candidate is a duplicate when
+    the estimated Jaccard similarity reaches the threshold.
+    
+    Kept chunks (ID, sources and signature in one record) are appended to
+    `index_dir`/entries.jsonl by save(), so duplicates are also caught
+    across separate ingests. Call discard() instead if the chunks were not
+    stored. The file is append-only, so several deduplicators (one per
+    Streamlit session, ingest scripts) can share it; records written by
+    others are picked up before each deduplicate() call. Use one index_dir
+    per vector index, and call remove() when vectors are deleted.
+    """
+    
+    def __init__(self, index_dir: str = None, num_perm: int = None, bands: int = None,
+                 threshold: float = None, shingle_size: int = None):
+        self.index_dir = index_dir or Config.DEDUP_INDEX_DIR
+        self.num_perm = num_perm or Config.DEDUP_NUM_PERM
+        self.bands = bands or Config.DEDUP_BANDS
+        self.threshold = threshold if threshold is not None else Config.DEDUP_THRESHOLD
+        self.shingle_size = shingle_size or Config.DEDUP_SHINGLE_SIZE
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.rows = self.num_perm // self.bands
+        
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), size=self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=self.num_perm, dtype=np.uint64)
+        
+        self._load()
+    
+    def _load(self):
+        self.ids: List[str] = []
+        self.sources: Dict[str, List[str]] = {}
+        self.signatures: List[np.ndarray] = []
+        self._rows: Dict[str, int] = {}
+        self._removed_rows = set()
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._unsaved_ids: List[str] = []
+        self._pending_entries: List[dict] = []
+        self._offset = 0
+        self._refresh()
+    
+    def _refresh(self):
+        """Apply records appended to the entries file since it was last read"""
+        entries_path = os.path.join(self.index_dir, ENTRIES_FILE)
+        if not os.path.exists(entries_path):
+            return
+        
+        with open(entries_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Only complete lines; a concurrent writer may be mid-append
+        data = data[:data.rfind(b"\n") + 1]
+        self._offset += len(data)
+        
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._apply(entry)
+    
+    def _apply(self, entry: dict):
+        # Records are idempotent, so re-reading our own appends is harmless
+        vector_id = entry["id"]
+        if "signature" in entry:
+            if vector_id not in self._rows:
+                signature = np.frombuffer(bytes.fromhex(entry["signature"]), dtype=np.uint32)
+                self._add_row(vector_id, signature, list(entry["sources"]))
+        elif vector_id in self._rows and "add_source" in entry:
+            if entry["add_source"] not in self.sources[vector_id]:
+                self.sources[vector_id].append(entry["add_source"])
+        elif vector_id in self._rows and entry.get("removed"):
+            self._removed_rows.add(self._rows[vector_id])
+    
+    def _add_row(self, vector_id: str, signature: np.ndarray, sources: List[str]) -> int:
+        row = len(self.ids)
+        self.ids.append(vector_id)
+        self.signatures.append(signature)
+        self.sources[vector_id] = sources
+        self._rows[vector_id] = row
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(row)
+        return row
+    
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles"""
+        words = re.sub(r"\s+", " ", text.lower()).strip().split(" ")
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+        
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+    
+    def find_duplicate(self, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Best stored row whose estimated Jaccard similarity reaches the threshold"""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates -= self._removed_rows
+        if not candidates:
+            return None
+        
+        rows = np.fromiter(candidates, dtype=np.int64)
+        candidate_signatures = np.vstack([self.signatures[row] for row in rows])
+        similarity = (candidate_signatures == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        if similarity[best] >= self.threshold:
+            return int(rows[best]), float(similarity[best])
+        return None
+    
+    def remove(self, ids: Iterable[str]):
+        """Forget chunks whose vectors were deleted, so their content can be re-added"""
+        entries = []
+        for vector_id in ids:
+            row = self._rows.get(vector_id)
+            if row is not None and row not in self._removed_rows:
+                self._removed_rows.add(row)
+                entries.append({"id": vector_id, "removed": True})
+        self._append(entries)
+    
+    def _append(self, entries: List[dict]):
+        if not entries:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        # One append per call, so records from concurrent writers never interleave
+        with open(os.path.join(self.index_dir, ENTRIES_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+    
+    def deduplicate(self, documents: List[Document], ids: List[str],
+                    exists: Callable[[List[str]], Set[str]] = None) -> Tuple[List[Document], List[str], Dict[str, List[str]], dict]:
+        """
+        Drop near-duplicate chunks, merging their sources into the kept chunk
+        
+        Kept chunks get a "sources" metadata list. Duplicates of chunks
+        stored by an earlier ingest are returned separately so the caller
+        can update the stored vector's metadata.
+        
+        Args:
+            documents: Chunks to be embedded
+            ids: Vector ID assigned to each chunk
+            exists: Returns which of the given stored IDs are still in the
+                vector store; matches against missing IDs are forgotten and
+                the chunk is kept
+            
+        Returns:
+            (unique documents, their IDs, {existing ID: merged sources}, report)
+        """
+        self._refresh()
+        signatures = [self.signature(doc.page_content) for doc in documents]
+        
+        if exists:
+            # Verify every stored chunk we are about to match in one lookup
+            matched = set()
+            for signature in signatures:
+                match = self.find_duplicate(signature)
+                if match:
+                    matched.add(self.ids[match[0]])
+            if matched:
+                missing = matched - set(exists(sorted(matched)))
+                for vector_id in missing:
+                    self._removed_rows.add(self._rows[vector_id])
+                    self._pending_entries.append({"id": vector_id, "removed": True})
+        
+        unique_docs, unique_ids = [], []
+        kept = {}
+        updated_existing = {}
+        within_batch = 0
+        
+        for doc, doc_id, signature in zip(documents, ids, signatures):
+            source = doc.metadata.get("source", "Unknown")
+            match = self.find_duplicate(signature)
+            
+            if match:
+                row, _ = match
+                match_id = self.ids[row]
+                if source not in self.sources[match_id]:
+                    self.sources[match_id].append(source)
+                    if match_id not in kept:
+                        self._pending_entries.append({"id": match_id, "add_source": source})
+                if match_id in kept:
+                    within_batch += 1
+                    kept[match_id].metadata["sources"] = list(self.sources[match_id])
+                else:
+                    updated_existing[match_id] = list(self.sources[match_id])
+                continue
+            
+            # Chunks of one file may share a metadata dict, so copy before editing
+            doc.metadata = {**doc.metadata, "sources": [source]}
+            self._add_row(doc_id, signature, [source])
+            self._unsaved_ids.append(doc_id)
+            kept[doc_id] = doc
+            unique_docs.append(doc)
+            unique_ids.append(doc_id)
+        
+        report = {
+            "input_chunks": len(documents),
+            "unique_chunks": len(unique_docs),
+            "duplicates_within_batch": within_batch,
+            "duplicates_of_existing": len(documents) - len(unique_docs) - within_batch,
+        }
+        return unique_docs, unique_ids, updated_existing, report
+    
+    def save(self):
+        """Persist chunks and sources added since the last save"""
+        entries = self._pending_entries + [
+            {
+                "id": doc_id,
+                "sources": self.sources[doc_id],
+                "signature": self.signatures[self._rows[doc_id]].astype(np.uint32).tobytes().hex(),
+            }
+            for doc_id in self._unsaved_ids
+        ]
+        self._append(entries)
+        self._unsaved_ids = []
+        self._pending_entries = []
+    
+    def discard(self):
+        """Drop unsaved changes (e.g. when embedding the chunks failed)"""
+        self._load()
@@ -1,13 +1,19 @@
 """
 Document processor for handling PDF and DOCX files
 """
+import bisect
+import hashlib
 import os
-from typing import List
+import uuid
+from typing import Callable, List
+import docx
+import pypdf
 from pypdf import PdfReader
 from docx import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document as LangchainDocument
 from config import Config
+from extraction_cache import ExtractionCache
 
 
 class DocumentProcessor:
@@ -19,52 +25,92 @@ class DocumentProcessor:
             chunk_overlap=Config.CHUNK_OVERLAP,
             length_function=len,
         )
+        # Spooled uploads keyed by Streamlit file ID, so each upload is hashed once
+        self._spooled = {}
+        self.extraction_cache = ExtractionCache() if Config.EXTRACTION_CACHE_ENABLED else None
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
+    def _extract_pages(self, file_path: str, parser: str, parser_version: str,
+                       extract: Callable[[str], List[str]], file_hash: str = None) -> List[str]:
+        """Run a page extractor, reusing cached results for the same file content and parser"""
+        if not self.extraction_cache:
+            return extract(file_path)
+        
+        # The cache is best-effort: disk errors fall back to a fresh extraction
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            file_hash = file_hash or ExtractionCache.hash_file(file_path)
+            pages = self.extraction_cache.get(file_hash, parser, parser_version)
+        except OSError as e:
+            print(f"Extraction cache unavailable: {str(e)}")
+            return extract(file_path)
+        
+        if pages is None:
+            pages = extract(file_path)
+            try:
+                self.extraction_cache.put(file_hash, parser, parser_version, pages)
+            except OSError as e:
+                print(f"Could not write extraction cache entry: {str(e)}")
+        return pages
+    
+    def extract_pages_from_pdf(self, file_path: str, file_hash: str = None) -> List[str]:
+        """Extract the text of every page of a PDF file"""
+        try:
+            return self._extract_pages(
+                file_path, "pypdf", pypdf.__version__,
+                lambda path: [page.extract_text() for page in PdfReader(path).pages],
+                file_hash
+            )
         except Exception as e:
             raise Exception(f"Error reading PDF file: {str(e)}")
     
-    def extract_text_from_docx(self, file_path: str) -> str:
+    def extract_text_from_pdf(self, file_path: str, file_hash: str = None) -> str:
+        """Extract text from PDF file"""
+        return "".join(page + "\n" for page in self.extract_pages_from_pdf(file_path, file_hash))
+    
+    def extract_text_from_docx(self, file_path: str, file_hash: str = None) -> str:
         """Extract text from DOCX file"""
         try:
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            # DOCX has no pages; the whole body is cached as a single entry
+            pages = self._extract_pages(
+                file_path, "python-docx", docx.__version__,
+                lambda path: ["".join(paragraph.text + "\n" for paragraph in Document(path).paragraphs)],
+                file_hash
+            )
+            return pages[0]
         except Exception as e:
             raise Exception(f"Error reading DOCX file: {str(e)}")
     
-    def process_document(self, file_path: str) -> List[LangchainDocument]:
+    def process_document(self, file_path: str, source_name: str = None, file_hash: str = None) -> List[LangchainDocument]:
         """
         Process a document and return chunks
         
         Args:
             file_path: Path to the document
+            source_name: Name to record as the chunk source (defaults to the file name)
+            file_hash: SHA-256 of the file if already known (skips re-hashing for the extraction cache)
             
         Returns:
-            List of LangChain Document objects
+            List of LangChain Document objects (PDF chunks carry the 1-based
+            "page" they start on)
         """
         # Extract text based on file extension
         file_ext = os.path.splitext(file_path)[1].lower()
+        page_starts = None
         
         if file_ext == '.pdf':
-            text = self.extract_text_from_pdf(file_path)
+            pages = self.extract_pages_from_pdf(file_path, file_hash)
+            text = "".join(page + "\n" for page in pages)
+            # Character offset at which every page begins in the joined text
+            page_starts = [0]
+            for page in pages[:-1]:
+                page_starts.append(page_starts[-1] + len(page) + 1)
         elif file_ext in ['.docx', '.doc']:
-            text = self.extract_text_from_docx(file_path)
+            text = self.extract_text_from_docx(file_path, file_hash)
         else:
             raise ValueError(f"Unsupported file format: {file_ext}")
         
         # Create metadata
         metadata = {
-            "source": os.path.basename(file_path),
+            "source": source_name or os.path.basename(file_path),
             "file_type": file_ext
         }
         
@@ -72,13 +118,82 @@ class DocumentProcessor:
         chunks = self.text_splitter.split_text(text)
         
         # Create LangChain documents
-        documents = [
-            LangchainDocument(page_content=chunk, metadata=metadata)
-            for chunk in chunks
-        ]
+        documents = []
+        offset = 0
+        for chunk in chunks:
+            chunk_metadata = metadata
+            if page_starts:
+                # Chunks are in order and may overlap, so search on from the last start
+                start = text.find(chunk, offset)
+                if start >= 0:
+                    offset = start + 1
+                    chunk_metadata = {**metadata, "page": bisect.bisect_right(page_starts, start)}
+            documents.append(LangchainDocument(page_content=chunk, metadata=chunk_metadata))
         
         return documents
     
+    def spool_upload(self, uploaded_file, filename: str) -> dict:
+        """
+        Stream an upload to content-addressed storage, hashing it on the way
+        
+        The file is copied in Config.UPLOAD_BLOCK_SIZE blocks to a temporary
+        file while its SHA-256 is computed, then moved to
+        UPLOAD_DIR/objects/<hash[:2]>/<hash><ext>. Identical uploads share one
+        stored file and same-named uploads no longer overwrite each other.
+        Results are cached by Streamlit file ID, so reruns do not re-read the file.
+        
+        Args:
+            uploaded_file: File object from Streamlit
+            filename: Name of the file
+            
+        Returns:
+            Dictionary with name, size, sha256 and path of the spooled file
+        """
+        # Without a Streamlit file ID there is no safe cache key (name and size
+        # are shared by different files), so the upload is always re-hashed
+        key = getattr(uploaded_file, "file_id", None)
+        cached = self._spooled.get(key) if key else None
+        if cached and os.path.exists(cached["path"]):
+            return cached
+        
+        incoming_dir = os.path.join(Config.UPLOAD_DIR, "incoming")
+        os.makedirs(incoming_dir, exist_ok=True)
+        tmp_path = os.path.join(incoming_dir, f"{uuid.uuid4().hex}.part")
+        
+        digest = hashlib.sha256()
+        size = 0
+        uploaded_file.seek(0)
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    block = uploaded_file.read(Config.UPLOAD_BLOCK_SIZE)
+                    if not block:
+                        break
+                    digest.update(block)
+                    f.write(block)
+                    size += len(block)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            uploaded_file.seek(0)
+        
+        sha256 = digest.hexdigest()
+        ext = os.path.splitext(filename)[1].lower()
+        object_dir = os.path.join(Config.UPLOAD_DIR, "objects", sha256[:2])
+        os.makedirs(object_dir, exist_ok=True)
+        file_path = os.path.join(object_dir, f"{sha256}{ext}")
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, file_path)
+        
+        spooled = {"name": filename, "size": size, "sha256": sha256, "path": file_path}
+        if key:
+            self._spooled[key] = spooled
+        return spooled
+    
     def save_uploaded_file(self, uploaded_file, filename: str) -> str:
         """
         Save uploaded file to disk
@@ -90,12 +205,4 @@ class DocumentProcessor:
         Returns:
             Path to saved file
         """
-        # Create upload directory if it doesn't exist
-        os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(Config.UPLOAD_DIR, filename)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        return file_path
+        return self.spool_upload(uploaded_file, filename)["path"]
@@ -0,0 +1,301 @@
+"""
+Shared local embedding service with request micro-batching
+
+One server process loads Config.EMBEDDING_MODEL and serves every client
+(Streamlit workers, ingest scripts) over a Unix socket, or TCP on
+platforms without Unix sockets. Concurrent requests are coalesced into
+micro-batches so the model runs at batched throughput. Small requests
+(interactive queries) are batched ahead of queued bulk ingest texts.
+
+Wire format: every message is a 4-byte big-endian length followed by the
+payload. Requests are JSON ({"op": "embed", "texts": [...]} or
+{"op": "stats"}). An embed reply is a JSON header ({"count", "dimension"}
+or {"error"}) followed by a frame of raw float32 vectors.
+"""
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import Config
+
+
+_HEADER = struct.Struct(">I")
+
+
+def _parse_address(address: str) -> Tuple[str, object]:
+    """Return ("tcp", (host, port)) for tcp://host:port, else ("unix", path)"""
+    if address.startswith("tcp://"):
+        host, port = address[len("tcp://"):].rsplit(":", 1)
+        return "tcp", (host, int(port))
+    return "unix", address
+
+
+class EmbeddingServer:
+    """Serve embeddings for one model, batching concurrent requests"""
+    
+    def __init__(self, address: str = None, model_name: str = None,
+                 max_batch_size: int = None, max_wait_ms: float = None, priority_max_texts: int = None):
+        self.address = address or Config.EMBEDDING_SERVICE_ADDRESS
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.max_batch_size = max_batch_size or Config.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else Config.EMBEDDING_MAX_WAIT_MS) / 1000
+        self.priority_max_texts = priority_max_texts or Config.EMBEDDING_PRIORITY_MAX_TEXTS
+        self.model = None
+        # (priority, sequence, text, future); priority 0 = small request, 1 = bulk
+        self._queue = None
+        self._sequence = 0
+        
+        # Metrics
+        self.started_at = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+        self.embed_seconds = 0.0
+        self.cancelled_texts = 0
+    
+    def load_model(self):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        self.model = HuggingFaceEmbeddings(model_name=self.model_name)
+    
+    def stats(self) -> dict:
+        """Queue depth and batching metrics"""
+        return {
+            "model": self.model_name,
+            "uptime_seconds": time.time() - self.started_at,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "embed_seconds": self.embed_seconds,
+            "cancelled_texts": self.cancelled_texts,
+        }
+    
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        """Queue texts individually and wait for the batcher to embed them"""
+        loop = asyncio.get_running_loop()
+        priority = 0 if len(texts) <= self.priority_max_texts else 1
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._sequence += 1
+            self._queue.put_nowait((priority, self._sequence, text, future))
+            futures.append(future)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return np.asarray(await asyncio.gather(*futures), dtype=np.float32)
+    
+    async def _batcher(self):
+        """Collect queued texts for up to max_wait and embed them in one call"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Texts of clients that disconnected were cancelled; skip them
+            live = [(text, future) for _, _, text, future in batch if not future.done()]
+            self.cancelled_texts += len(batch) - len(live)
+            if not live:
+                continue
+            
+            texts = [text for text, _ in live]
+            start = time.perf_counter()
+            try:
+                vectors = await loop.run_in_executor(None, self.model.embed_documents, texts)
+            except Exception as e:
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.embed_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.batch_sizes[len(live)] += 1
+            for (_, future), vector in zip(live, vectors):
+                if not future.done():
+                    future.set_result(vector)
+    
+    async def _embed_until_disconnect(self, texts: List[str], reader: asyncio.StreamReader) -> np.ndarray:
+        """Embed texts, cancelling the queued work if the client goes away"""
+        task = asyncio.ensure_future(self._embed(texts))
+        while True:
+            done, _ = await asyncio.wait([task], timeout=0.1)
+            if done:
+                return task.result()
+            # Clients send one request at a time, so EOF means they disconnected
+            if reader.at_eof():
+                task.cancel()
+                raise ConnectionResetError("Client disconnected")
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                request = json.loads(await reader.readexactly(length))
+                
+                if request.get("op") == "stats":
+                    writer.write(_frame(json.dumps(self.stats()).encode("utf-8")))
+                elif request.get("op") == "embed":
+                    texts = request.get("texts", [])
+                    self.requests += 1
+                    self.texts += len(texts)
+                    try:
+                        vectors = await self._embed_until_disconnect(texts, reader) if texts else np.zeros((0, 0), dtype=np.float32)
+                        header = {"count": len(vectors), "dimension": int(vectors.shape[1]) if len(vectors) else 0}
+                        writer.write(_frame(json.dumps(header).encode("utf-8")) + _frame(vectors.tobytes()))
+                    except ConnectionError:
+                        raise
+                    except Exception as e:
+                        writer.write(_frame(json.dumps({"error": str(e)}).encode("utf-8")) + _frame(b""))
+                else:
+                    writer.write(_frame(json.dumps({"error": f"Unknown op: {request.get('op')}"}).encode("utf-8")))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # Client went away (including ConnectionResetError/BrokenPipeError on drain)
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self):
+        """Load the model and serve until cancelled"""
+        if self.model is None:
+            self.load_model()
+        self._queue = asyncio.PriorityQueue()
+        batcher = asyncio.create_task(self._batcher())
+        
+        kind, target = _parse_address(self.address)
+        if kind == "tcp":
+            server = await asyncio.start_server(self._handle, *target)
+        else:
+            if os.path.dirname(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                os.remove(target)
+            server = await asyncio.start_unix_server(self._handle, path=target)
+        
+        print(f"Embedding service ({self.model_name}) listening on {self.address}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if kind == "unix" and os.path.exists(target):
+                os.remove(target)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _HEADER.pack(len(payload)) + payload
+
+
+class _ClosedBeforeReply(ConnectionError):
+    """The server closed the connection without sending any reply bytes"""
+
+
+def _recv_exactly(sock: socket.socket, size: int, first: bool = False) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        try:
+            chunk = sock.recv(size - len(data))
+        except ConnectionResetError:
+            chunk = b""
+        if not chunk:
+            if first and not data:
+                raise _ClosedBeforeReply("Embedding service closed the connection before replying")
+            raise ConnectionError("Embedding service closed the connection")
+        data.extend(chunk)
+    return bytes(data)
+
+
+class EmbeddingClient(Embeddings):
+    """Drop-in LangChain Embeddings that call the shared embedding service"""
+    
+    def __init__(self, address: str = None, timeout: float = 60.0):
+        self.address = address or Config.EMBEDDING_SERVICE_ADDRESS
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    @staticmethod
+    def is_available(address: str = None) -> bool:
+        """Whether a server is listening at the address"""
+        try:
+            EmbeddingClient(address, timeout=1.0).stats()
+            return True
+        except (OSError, ConnectionError, ValueError):
+            return False
+    
+    def _connect(self) -> socket.socket:
+        kind, target = _parse_address(self.address)
+        if kind == "unix" and not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported here; use a tcp://host:port address")
+        family = socket.AF_INET if kind == "tcp" else socket.AF_UNIX
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        return sock
+    
+    def _request(self, payload: dict, binary_reply: bool, timeout: float = None) -> Tuple[dict, bytes]:
+        # One connection per thread, reopened if the server went away. A
+        # request is only resent if it never reached the server: once sent,
+        # the server keeps working on it, so resending would embed it twice.
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            reused = sock is not None
+            sent = False
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                sock.settimeout(timeout or self.timeout)
+                sock.sendall(_frame(json.dumps(payload).encode("utf-8")))
+                sent = True
+                (length,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size, first=True))
+                header = json.loads(_recv_exactly(sock, length))
+                body = b""
+                if binary_reply:
+                    (length,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+                    body = _recv_exactly(sock, length)
+                return header, body
+            except (OSError, ConnectionError) as e:
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                # A reused connection closed before replying means the server
+                # restarted since the last request; anything else is final
+                stale = reused and sent and isinstance(e, _ClosedBeforeReply)
+                if attempt or (sent and not stale):
+                    raise
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Large ingest batches can take minutes on CPU, so allow time per text
+        timeout = self.timeout + len(texts) * Config.EMBEDDING_TIMEOUT_PER_TEXT
+        header, body = self._request({"op": "embed", "texts": list(texts)}, binary_reply=True, timeout=timeout)
+        if "error" in header:
+            raise Exception(f"Embedding service error: {header['error']}")
+        vectors = np.frombuffer(body, dtype=np.float32).reshape(header["count"], header["dimension"])
+        return vectors.tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+    
+    def stats(self) -> dict:
+        """Fetch queue depth and batching metrics from the server"""
+        header, _ = self._request({"op": "stats"}, binary_reply=False)
+        return header
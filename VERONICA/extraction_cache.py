@@ -0,0 +1,133 @@
+"""
+Persistent cache of extracted page text
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+import zlib
+from typing import List, Optional
+from config import Config
+
+
+class ExtractionCache:
+    """
+    Per-page extracted text keyed by (file hash, parser, parser version)
+    
+    Entries are gzip-compressed JSON files under `cache_dir`. A hit touches
+    the file's mtime, and when the total size exceeds `max_bytes` the least
+    recently used entries are evicted. Bumping the parser version (e.g. a
+    pypdf upgrade) naturally misses the old entries, which then age out.
+    """
+    
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or Config.EXTRACTION_CACHE_DIR
+        self.max_bytes = max_bytes or Config.EXTRACTION_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+    
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """SHA-256 of a file, read in blocks"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(Config.UPLOAD_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _path(self, file_hash: str, parser: str, parser_version: str) -> str:
+        key = hashlib.sha256(f"{file_hash}:{parser}:{parser_version}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+    
+    def get(self, file_hash: str, parser: str, parser_version: str) -> Optional[List[str]]:
+        """Cached page texts, or None on a miss"""
+        path = self._path(file_hash, parser, parser_version)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                pages = json.load(f)["pages"]
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, EOFError, zlib.error, ValueError, KeyError):
+            # Truncated or corrupt entry: drop it so it is rewritten
+            self.misses += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        
+        # Mark as recently used; the entry may already have been evicted by another process
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self.hits += 1
+        return pages
+    
+    def put(self, file_hash: str, parser: str, parser_version: str, pages: List[str]):
+        """Store page texts and evict old entries if over the size limit"""
+        path = self._path(file_hash, parser, parser_version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"parser": parser, "parser_version": parser_version, "pages": pages}, f)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        if self._total_bytes is None:
+            self._total_bytes = self._scan_size()
+        else:
+            self._total_bytes += os.path.getsize(path) - previous
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        # Removed by another process while walking
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+    
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+    
+    def _evict(self):
+        """Delete least recently used entries until under the size limit"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+    
+    def stats(self) -> dict:
+        """Hit/miss counts and current size on disk"""
+        if self._total_bytes is None:
+            self._total_bytes = self._scan_size()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
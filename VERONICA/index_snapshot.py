@@ -0,0 +1,422 @@
+"""
+Portable vector index snapshots
+
+A snapshot is a directory containing:
+- manifest.json  : count, dimension, metric, embedding model and a snapshot id
+- vectors.f32    : float32 row-major (count x dimension) array, memory-mappable
+- norms.f32      : float32 L2 norm of every vector (precomputed for cosine search)
+- chunks.arrow   : Arrow IPC file with id, text and JSON-encoded metadata columns
+- deleted.i64    : (optional) int64 row numbers that have been deleted
+
+Appends add rows to the end of vectors.f32/norms.f32 and write an extra
+chunks segment (chunks-00001.arrow, ...) listed in the manifest. The
+snapshot id changes only when the snapshot is rewritten (row numbers change).
+
+Writers (append, delete, compact) hold snapshot_lock(path), an exclusive
+lock on <path>.lock next to the directory so it survives compaction
+replacing the directory. Readers do not lock: the manifest is replaced
+atomically and only lists rows whose data is fully written.
+"""
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+import numpy as np
+import pyarrow as pa
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+NORMS_FILE = "norms.f32"
+CHUNKS_FILE = "chunks.arrow"
+DELETED_FILE = "deleted.i64"
+
+CHUNKS_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("text", pa.string()),
+    ("metadata", pa.string()),
+])
+
+
+def _chunks_batch(ids: List[str], texts: List[str], metadatas: List[dict]) -> pa.RecordBatch:
+    return pa.record_batch([
+        pa.array(ids, type=pa.string()),
+        pa.array(texts, type=pa.string()),
+        pa.array([json.dumps(m or {}) for m in metadatas], type=pa.string()),
+    ], schema=CHUNKS_SCHEMA)
+
+
+class SnapshotWriter:
+    """Stream vectors and chunks into a new snapshot directory"""
+    
+    def __init__(self, path: str, dimension: int, metric: str = "cosine",
+                 embedding_model: str = Config.EMBEDDING_MODEL):
+        self._created_dir = not os.path.exists(path)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.metric = metric
+        self.embedding_model = embedding_model
+        self.count = 0
+        self._vectors = open(os.path.join(path, VECTORS_FILE), "wb")
+        self._norms = open(os.path.join(path, NORMS_FILE), "wb")
+        self._chunks_sink = pa.OSFile(os.path.join(path, CHUNKS_FILE), "wb")
+        self._chunks = pa.ipc.new_file(self._chunks_sink, CHUNKS_SCHEMA)
+    
+    def add(self, ids: List[str], vectors, texts: List[str], metadatas: List[dict]):
+        """
+        Append a batch of records
+        
+        Args:
+            ids: Vector IDs
+            vectors: Array-like of shape (len(ids), dimension)
+            texts: Chunk text for every vector
+            metadatas: Metadata dict for every vector (without the text)
+        """
+        if not ids:
+            return
+        
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dimension)
+        self._vectors.write(vectors.tobytes())
+        self._norms.write(np.linalg.norm(vectors, axis=1).astype(np.float32).tobytes())
+        self._chunks.write_batch(_chunks_batch(ids, texts, metadatas))
+        self.count += len(ids)
+    
+    def close(self):
+        """Flush data files and write the manifest"""
+        self._vectors.close()
+        self._norms.close()
+        self._chunks.close()
+        self._chunks_sink.close()
+        
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "id": uuid.uuid4().hex,
+            "count": self.count,
+            "dimension": self.dimension,
+            "metric": self.metric,
+            "embedding_model": self.embedding_model,
+            "segments": [CHUNKS_FILE],
+        }
+        _write_manifest(self.path, manifest)
+    
+    def abort(self):
+        """Discard the partially written snapshot"""
+        for handle in (self._vectors, self._norms, self._chunks, self._chunks_sink):
+            try:
+                handle.close()
+            except Exception:
+                pass
+        # The data files were truncated on open, so a manifest left over from
+        # an earlier snapshot at this path no longer describes them either
+        for name in (MANIFEST_FILE, VECTORS_FILE, NORMS_FILE, CHUNKS_FILE):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+        if self._created_dir and not os.listdir(self.path):
+            os.rmdir(self.path)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Only a complete snapshot gets a manifest
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class Snapshot:
+    """
+    Read-only view of a snapshot directory
+    
+    Vectors and chunks are memory-mapped, so opening a snapshot costs the
+    same regardless of its size; pages are only read when touched.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {self.manifest.get('version')}")
+        
+        self.count = self.manifest["count"]
+        self.dimension = self.manifest["dimension"]
+        
+        if self.count:
+            self.vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32,
+                                     mode="r", shape=(self.count, self.dimension))
+            self.norms = np.memmap(os.path.join(path, NORMS_FILE), dtype=np.float32,
+                                   mode="r", shape=(self.count,))
+        else:
+            self.vectors = np.zeros((0, self.dimension), dtype=np.float32)
+            self.norms = np.zeros((0,), dtype=np.float32)
+        
+        self._chunks_sources = [
+            pa.memory_map(os.path.join(path, segment), "r")
+            for segment in self.manifest.get("segments", [CHUNKS_FILE])
+        ]
+        self.chunks = pa.concat_tables([pa.ipc.open_file(source).read_all() for source in self._chunks_sources])
+        
+        deleted_path = os.path.join(path, DELETED_FILE)
+        self.deleted = np.fromfile(deleted_path, dtype=np.int64) if os.path.exists(deleted_path) else np.zeros(0, dtype=np.int64)
+        self._deleted_bytes = os.path.getsize(deleted_path) if os.path.exists(deleted_path) else 0
+        self.live_mask = np.ones(self.count, dtype=bool)
+        self.live_mask[self.deleted] = False
+    
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST_FILE))
+    
+    def __len__(self):
+        return self.count
+    
+    def changed(self) -> bool:
+        """Whether rows were appended, deleted or rewritten on disk since this view was opened"""
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            # Missing or mid-replace; keep using this view
+            return False
+        if manifest.get("id") != self.manifest.get("id") or manifest.get("count") != self.count:
+            return True
+        deleted_path = os.path.join(self.path, DELETED_FILE)
+        deleted_bytes = os.path.getsize(deleted_path) if os.path.exists(deleted_path) else 0
+        return deleted_bytes != self._deleted_bytes
+    
+    def live_count(self) -> int:
+        """Number of rows that have not been deleted"""
+        return int(self.live_mask.sum())
+    
+    def row_ids(self) -> List[str]:
+        """Vector ID of every row"""
+        return self.chunks.column("id").to_pylist()
+    
+    def get(self, i: int) -> Tuple[str, str, dict]:
+        """Return (id, text, metadata) for row i"""
+        return (
+            self.chunks.column("id")[i].as_py(),
+            self.chunks.column("text")[i].as_py(),
+            json.loads(self.chunks.column("metadata")[i].as_py()),
+        )
+    
+    def iter_batches(self, batch_size: int = 1000, include_deleted: bool = False) -> Iterator[tuple]:
+        """Yield (ids, vectors, texts, metadatas) in row order"""
+        for start in range(0, self.count, batch_size):
+            batch = self.chunks.slice(start, batch_size)
+            ids = batch.column("id").to_pylist()
+            texts = batch.column("text").to_pylist()
+            metadatas = [json.loads(m) for m in batch.column("metadata").to_pylist()]
+            vectors = self.vectors[start:start + len(ids)]
+            
+            if not include_deleted:
+                live = self.live_mask[start:start + len(ids)]
+                if not live.all():
+                    keep = np.flatnonzero(live)
+                    ids = [ids[i] for i in keep]
+                    texts = [texts[i] for i in keep]
+                    metadatas = [metadatas[i] for i in keep]
+                    vectors = vectors[keep]
+            yield ids, vectors, texts, metadatas
+    
+    def close(self):
+        """Release the memory maps (required before replacing files on Windows)"""
+        if isinstance(self.vectors, np.memmap):
+            self.vectors._mmap.close()
+            self.norms._mmap.close()
+        self.vectors = self.norms = self.chunks = None
+        for source in self._chunks_sources:
+            source.close()
+
+
+_held_locks = {}
+_held_locks_guard = threading.Lock()
+
+
+def _lock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after ~10 seconds; keep waiting
+            continue
+
+
+def _unlock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def snapshot_lock(path: str):
+    """
+    Hold the exclusive writer lock for a snapshot
+    
+    Re-entrant within a process, so functions that lock can call each other.
+    """
+    key = os.path.abspath(path)
+    with _held_locks_guard:
+        held = _held_locks.setdefault(key, {"lock": threading.RLock(), "depth": 0, "file": None})
+    
+    with held["lock"]:
+        if held["depth"] == 0:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            f = open(key + ".lock", "a+b")
+            try:
+                _lock_file(f)
+            except BaseException:
+                f.close()
+                raise
+            held["file"] = f
+        held["depth"] += 1
+        try:
+            yield
+        finally:
+            held["depth"] -= 1
+            if held["depth"] == 0:
+                _unlock_file(held["file"])
+                held["file"].close()
+                held["file"] = None
+
+
+def _write_manifest(path: str, manifest: dict):
+    # Unique name: a stale temp file from a crashed writer is never reused
+    tmp_path = os.path.join(path, f"{MANIFEST_FILE}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+
+def append_to_snapshot(path: str, ids: List[str], vectors, texts: List[str], metadatas: List[dict]) -> int:
+    """
+    Append rows to a snapshot, creating it if needed
+    
+    Any open Snapshot for the path must be closed first.
+    
+    Returns:
+        Row number of the first appended row
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    with snapshot_lock(path):
+        if not Snapshot.exists(path):
+            with SnapshotWriter(path, vectors.shape[1]) as writer:
+                writer.add(ids, vectors, texts, metadatas)
+            return 0
+        
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        start_row = manifest["count"]
+        vectors = vectors.reshape(len(ids), manifest["dimension"])
+        
+        # Drop bytes past the manifest count left by an append that crashed
+        # before writing its manifest, so new rows land at start_row
+        _append_at(os.path.join(path, VECTORS_FILE), start_row * manifest["dimension"] * 4, vectors.tobytes())
+        _append_at(os.path.join(path, NORMS_FILE), start_row * 4,
+                   np.linalg.norm(vectors, axis=1).astype(np.float32).tobytes())
+        
+        segments = manifest.get("segments", [CHUNKS_FILE])
+        segment = f"chunks-{len(segments):05d}.arrow"
+        with pa.OSFile(os.path.join(path, segment), "wb") as sink:
+            with pa.ipc.new_file(sink, CHUNKS_SCHEMA) as writer:
+                writer.write_batch(_chunks_batch(ids, texts, metadatas))
+        
+        manifest["count"] = start_row + len(ids)
+        manifest["segments"] = segments + [segment]
+        _write_manifest(path, manifest)
+        return start_row
+
+
+def _append_at(file_path: str, offset: int, data: bytes):
+    with open(file_path, "r+b") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(data)
+
+
+def mark_deleted(path: str, rows):
+    """Record deleted row numbers for a snapshot"""
+    with snapshot_lock(path):
+        with open(os.path.join(path, DELETED_FILE), "ab") as f:
+            f.write(np.asarray(rows, dtype=np.int64).tobytes())
+
+
+def export_pinecone(index, path: str, dimension: int, namespace: str = "",
+                    batch_size: int = 100, text_key: str = "text") -> int:
+    """
+    Dump every vector in a Pinecone index into a snapshot
+    
+    Args:
+        index: pinecone Index object
+        path: Snapshot directory to create
+        dimension: Vector dimension of the index
+        namespace: Pinecone namespace to dump
+        batch_size: IDs fetched per request
+        text_key: Metadata key holding the chunk text (LangChain default: "text")
+        
+    Returns:
+        Number of vectors written
+    """
+    with SnapshotWriter(path, dimension) as writer:
+        for id_batch in index.list(namespace=namespace, limit=batch_size):
+            fetched = index.fetch(ids=list(id_batch), namespace=namespace).vectors
+            ids, vectors, texts, metadatas = [], [], [], []
+            for vector_id, record in fetched.items():
+                metadata = dict(record.metadata or {})
+                ids.append(vector_id)
+                vectors.append(record.values)
+                texts.append(metadata.pop(text_key, ""))
+                metadatas.append(metadata)
+            writer.add(ids, vectors, texts, metadatas)
+        return writer.count
+
+
+def restore_pinecone(index, snapshot: Snapshot, namespace: str = "",
+                     batch_size: int = 100, text_key: str = "text") -> int:
+    """
+    Bulk-upsert a snapshot into a Pinecone index
+    
+    Args:
+        index: pinecone Index object (dimension must match the snapshot)
+        snapshot: Snapshot to restore
+        namespace: Target namespace
+        batch_size: Vectors per upsert request
+        text_key: Metadata key to store the chunk text under
+        
+    Returns:
+        Number of vectors upserted
+    """
+    restored = 0
+    for ids, vectors, texts, metadatas in snapshot.iter_batches(batch_size):
+        records = []
+        for vector_id, vector, text, metadata in zip(ids, vectors, texts, metadatas):
+            records.append({
+                "id": vector_id,
+                "values": vector.tolist(),
+                "metadata": {**metadata, text_key: text},
+            })
+        index.upsert(vectors=records, namespace=namespace)
+        restored += len(records)
+    return restored
@@ -1,55 +1,77 @@
 """
 LLM Manager for handling local Ollama models
 """
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from langchain_community.llms import Ollama
-from langchain.chains import ConversationalRetrievalChain
+from langchain.chains import ConversationalRetrievalChain, LLMChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain.chains.question_answering import load_qa_chain
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
+from langchain.schema import Document, get_buffer_string
 from config import Config
+from ollama_pool import PooledOllama, get_shared_pool
+
+
+# Custom prompt template
+QA_TEMPLATE = """You are an AI assistant helping users understand their documents.
+Use the following context to answer the question. If you don't know the answer based on the context,
+say "I don't have enough information in the uploaded documents to answer that question."
+
+Context: {context}
+
+Question: {question}
+
+Provide a detailed and helpful answer:"""
+
+QA_PROMPT = PromptTemplate(
+    template=QA_TEMPLATE,
+    input_variables=["context", "question"]
+)
 
 
 class LLMManager:
     """Manage local LLM interactions using Ollama"""
     
-    def __init__(self):
-        self.llm = Ollama(
-            model=Config.OLLAMA_MODEL,
-            base_url=Config.OLLAMA_BASE_URL,
-            temperature=0.7,
-        )
+    def __init__(self, base_urls: List[str] = None):
+        base_urls = base_urls or Config.OLLAMA_BASE_URLS
+        self.pool = None
+        if len(base_urls) > 1:
+            # Spread requests across several Ollama servers (pool shared by all sessions)
+            self.pool = get_shared_pool(base_urls)
+            self.llm = PooledOllama(pool=self.pool)
+        else:
+            self.llm = Ollama(
+                model=Config.OLLAMA_MODEL,
+                base_url=base_urls[0],
+                temperature=0.7,
+            )
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True,
             output_key="answer"
         )
         self.qa_chain = None
+        self.retriever = None
+        self.embeddings = None
+        self.condense_chain = None
+        self.answer_chain = None
+        self._executor = ThreadPoolExecutor(max_workers=2)
     
-    def create_qa_chain(self, retriever):
+    def create_qa_chain(self, retriever, embeddings=None):
         """
         Create a conversational QA chain
         
         Args:
             retriever: Vector store retriever
-            
+            embeddings: Embeddings used to compare raw and condensed questions
+                (defaults to the retriever's vector store embeddings)
+        
         Returns:
             ConversationalRetrievalChain
         """
-        # Custom prompt template
-        template = """You are an AI assistant helping users understand their documents. 
-Use the following context to answer the question. If you don't know the answer based on the context, 
-say "I don't have enough information in the uploaded documents to answer that question."
-
-Context: {context}
-
-Question: {question}
-
-Provide a detailed and helpful answer:"""
-        
-        QA_PROMPT = PromptTemplate(
-            template=template,
-            input_variables=["context", "question"]
-        )
-        
         self.qa_chain = ConversationalRetrievalChain.from_llm(
             llm=self.llm,
             retriever=retriever,
@@ -58,6 +80,14 @@ Provide a detailed and helpful answer:"""
             combine_docs_chain_kwargs={"prompt": QA_PROMPT}
         )
         
+        # Pieces used by the orchestrated QA path
+        self.retriever = retriever
+        self.embeddings = embeddings or getattr(
+            getattr(retriever, "vectorstore", None), "embeddings", None
+        )
+        self.condense_chain = LLMChain(llm=self.llm, prompt=CONDENSE_QUESTION_PROMPT)
+        self.answer_chain = load_qa_chain(self.llm, chain_type="stuff", prompt=QA_PROMPT)
+        
         return self.qa_chain
     
     def ask_question(self, question: str) -> dict:
@@ -73,6 +103,9 @@ Provide a detailed and helpful answer:"""
         if not self.qa_chain:
             raise Exception("QA chain not initialized. Please upload documents first.")
         
+        if Config.QA_SPECULATIVE_RETRIEVAL:
+            return self.ask_question_orchestrated(question)
+        
         try:
             result = self.qa_chain({"question": question})
             return {
@@ -85,10 +118,93 @@ Provide a detailed and helpful answer:"""
                 "source_documents": []
             }
     
+    def ask_question_orchestrated(self, question: str) -> dict:
+        """
+        Ask a question, overlapping question condensation with retrieval
+        
+        Retrieval with the raw question starts while the LLM rewrites the
+        follow-up into a standalone question. If the rewrite stays close to
+        the raw question the speculative results are used as-is; otherwise a
+        second retrieval with the rewritten question is merged in.
+        
+        Args:
+            question: User's question
+        
+        Returns:
+            Dictionary with answer and source documents
+        """
+        if not self.qa_chain:
+            raise Exception("QA chain not initialized. Please upload documents first.")
+        
+        try:
+            chat_history = self.memory.load_memory_variables({})["chat_history"]
+            speculative = self._executor.submit(self.retriever.get_relevant_documents, question)
+            
+            standalone_question = question
+            if chat_history:
+                standalone_question = self.condense_chain.run(
+                    question=question,
+                    chat_history=get_buffer_string(chat_history)
+                ).strip() or question
+            
+            docs = speculative.result()
+            if self._question_similarity(question, standalone_question) < Config.QA_REWRITE_SIMILARITY_THRESHOLD:
+                rewritten_docs = self.retriever.get_relevant_documents(standalone_question)
+                docs = self._merge_documents(rewritten_docs, docs)
+            
+            answer = self.answer_chain.run(input_documents=docs, question=standalone_question)
+            self.memory.save_context({"question": question}, {"answer": answer})
+            return {
+                "answer": answer,
+                "source_documents": docs
+            }
+        except Exception as e:
+            return {
+                "answer": f"Error processing question: {str(e)}",
+                "source_documents": []
+            }
+    
+    def _question_similarity(self, original: str, rewritten: str) -> float:
+        """Cosine similarity of two questions (token overlap if no embeddings)"""
+        if original.strip().lower() == rewritten.strip().lower():
+            return 1.0
+        
+        if self.embeddings is not None:
+            a, b = self.embeddings.embed_documents([original, rewritten])
+            dot = sum(x * y for x, y in zip(a, b))
+            norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+            return dot / norm if norm else 0.0
+        
+        a_tokens = set(original.lower().split())
+        b_tokens = set(rewritten.lower().split())
+        if not a_tokens or not b_tokens:
+            return 0.0
+        return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
+    
+    @staticmethod
+    def _merge_documents(primary: List[Document], secondary: List[Document]) -> List[Document]:
+        """Merge two result lists, preferring primary and dropping duplicates"""
+        limit = max(len(primary), len(secondary))
+        merged = []
+        seen = set()
+        for doc in primary + secondary:
+            key = (doc.page_content, doc.metadata.get("source"))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(doc)
+        return merged[:limit]
+    
     def reset_conversation(self):
         """Reset conversation memory"""
         self.memory.clear()
     
+    def get_backend_stats(self) -> List[dict]:
+        """Per-endpoint health and latency stats (empty for a single backend)"""
+        if not self.pool:
+            return []
+        return self.pool.stats()
+    
     def test_connection(self) -> bool:
         """Test if Ollama is running and accessible"""
         try:
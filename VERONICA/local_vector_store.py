@@ -0,0 +1,363 @@
+"""
+Local vector store backed by a memory-mapped index snapshot
+"""
+import os
+import shutil
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from ann_index import IVFIndex
+from config import Config
+from index_snapshot import Snapshot, SnapshotWriter, append_to_snapshot, mark_deleted, snapshot_lock
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Cosine-similarity search over a snapshot directory
+    
+    The snapshot is opened in place (memory-mapped), so loading is instant
+    and no data is copied. New texts are appended to the snapshot files and
+    deletes are recorded as tombstones; compact() rewrites the snapshot
+    without deleted rows. With index_type "ivf", an on-disk IVF index built
+    by build_ann_index() (see scripts/evaluate_ann.py) is kept up to date
+    incrementally; searches are exact until it has been built.
+    """
+    
+    def __init__(self, embedding: Embeddings, path: str, index_type: str = None):
+        self._embedding = embedding
+        self.path = path
+        self.index_type = index_type or Config.LOCAL_INDEX_TYPE
+        self.snapshot = Snapshot(path) if Snapshot.exists(path) else None
+        self._row_index = None
+        self._row_index_count = 0
+        self.ann_index = None
+        self._sync_ann_index()
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+    
+    def count(self) -> int:
+        self._refresh()
+        return self.snapshot.live_count() if self.snapshot else 0
+    
+    def _reopen(self):
+        """Re-read the snapshot, picking up rows written since it was opened"""
+        old_id = None
+        if self.snapshot:
+            old_id = self.snapshot.manifest.get("id")
+            self.snapshot.close()
+        self.snapshot = Snapshot(self.path) if Snapshot.exists(self.path) else None
+        if not self.snapshot or self.snapshot.manifest.get("id") != old_id or self.snapshot.count < self._row_index_count:
+            # Rewritten (compacted) snapshot: row numbers changed
+            self._row_index = None
+            self._row_index_count = 0
+            self.ann_index = None
+    
+    def _refresh(self):
+        """Reopen the snapshot if another process appended, deleted or compacted"""
+        if self.snapshot is None:
+            if not Snapshot.exists(self.path):
+                return
+        elif not self.snapshot.changed():
+            return
+        self._reopen()
+        self._sync_ann_index()
+    
+    def _live_rows(self, ids: Iterable[str]) -> Dict[str, int]:
+        """Map vector IDs to their live rows, skipping unknown or deleted IDs"""
+        if not self.snapshot:
+            return {}
+        if self._row_index is None:
+            self._row_index = {}
+            self._row_index_count = 0
+        if self._row_index_count < self.snapshot.count:
+            # Only rows appended since the last lookup are scanned; later rows
+            # win, so re-appended (updated) vectors replace tombstoned ones
+            new_ids = self.snapshot.chunks.column("id").slice(self._row_index_count).to_pylist()
+            for offset, vector_id in enumerate(new_ids):
+                self._row_index[vector_id] = self._row_index_count + offset
+            self._row_index_count = self.snapshot.count
+        
+        found = {}
+        for vector_id in ids:
+            row = self._row_index.get(vector_id)
+            if row is not None and self.snapshot.live_mask[row]:
+                found[vector_id] = row
+        return found
+    
+    def _sync_ann_index(self):
+        """
+        Bring the IVF index in line with the snapshot
+        
+        Rows appended without the index (flat mode, another process) are
+        assigned to the existing lists and rows deleted elsewhere are
+        dropped. The index is never trained here: without one, or with one
+        built before the snapshot was rewritten, searches stay exact until
+        build_ann_index() runs.
+        """
+        if self.index_type != "ivf" or not self.snapshot:
+            return
+        if self.ann_index is None:
+            if not IVFIndex.exists(self.path):
+                return
+            self.ann_index = IVFIndex.load(self.path)
+        
+        covered = len(self.ann_index.assignments)
+        if self.ann_index.snapshot_id != self.snapshot.manifest.get("id") or covered > self.snapshot.count:
+            self.ann_index = None
+            return
+        
+        changed = False
+        if covered < self.snapshot.count:
+            self.ann_index.add(self.snapshot.vectors[covered:], covered)
+            changed = True
+        stale = np.flatnonzero(~self.snapshot.live_mask & (self.ann_index.assignments >= 0))
+        if len(stale):
+            self.ann_index.delete(stale)
+            changed = True
+        if changed:
+            with snapshot_lock(self.path):
+                self.ann_index.save()
+    
+    def get_by_ids(self, ids: List[str]) -> Dict[str, Document]:
+        """Look up live chunks by vector ID"""
+        self._refresh()
+        found = {}
+        for vector_id, row in self._live_rows(ids).items():
+            _, text, metadata = self.snapshot.get(row)
+            found[vector_id] = Document(page_content=text, metadata={**metadata, "id": vector_id})
+        return found
+    
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embed texts and add them to the snapshot
+        
+        Args:
+            texts: Chunk texts
+            metadatas: Optional metadata per text
+            ids: Optional IDs per text (random UUIDs by default)
+            
+        Returns:
+            IDs of the added texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        
+        if self.snapshot:
+            self.snapshot.close()
+        append_to_snapshot(self.path, ids, vectors, texts, metadatas)
+        self._reopen()
+        # Assigns every row the index does not cover yet, including these
+        self._sync_ann_index()
+        return ids
+    
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete vectors by ID
+        
+        Args:
+            ids: IDs to delete
+            
+        Returns:
+            True if any rows were deleted
+        """
+        if not ids:
+            return False
+        
+        # Locked so no other writer renumbers rows between lookup and tombstone
+        with snapshot_lock(self.path):
+            self._reopen()
+            rows = list(self._live_rows(ids).values())
+            if not rows:
+                return False
+            
+            self.snapshot.close()
+            mark_deleted(self.path, rows)
+            self._reopen()
+            self._sync_ann_index()
+        return True
+    
+    def update_metadata(self, metadatas: dict) -> int:
+        """
+        Merge metadata fields into stored vectors without re-embedding
+        
+        The row is tombstoned and re-appended with the same ID and vector.
+        
+        Args:
+            metadatas: {vector ID: metadata fields to set}
+            
+        Returns:
+            Number of vectors updated
+        """
+        if not metadatas:
+            return 0
+        
+        with snapshot_lock(self.path):
+            self._reopen()
+            ids, vectors, texts, new_metadatas, rows = [], [], [], [], []
+            for vector_id, row in self._live_rows(metadatas).items():
+                _, text, metadata = self.snapshot.get(row)
+                ids.append(vector_id)
+                vectors.append(np.array(self.snapshot.vectors[row]))
+                texts.append(text)
+                new_metadatas.append({**metadata, **metadatas[vector_id]})
+                rows.append(row)
+            if not rows:
+                return 0
+            
+            self.snapshot.close()
+            mark_deleted(self.path, rows)
+            append_to_snapshot(self.path, ids, np.vstack(vectors), texts, new_metadatas)
+            self._reopen()
+            self._sync_ann_index()
+        return len(rows)
+    
+    def compact(self):
+        """Rewrite the snapshot without deleted rows and rebuild the ANN index if there was one"""
+        with snapshot_lock(self.path):
+            # Include rows other processes wrote since this view was opened
+            self._reopen()
+            if not self.snapshot:
+                return
+            had_ann_index = self.index_type == "ivf" and IVFIndex.exists(self.path)
+            
+            tmp_path = f"{self.path}.tmp"
+            old_path = f"{self.path}.old"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            
+            with SnapshotWriter(tmp_path, self.snapshot.dimension) as writer:
+                for batch in self.snapshot.iter_batches():
+                    writer.add(*batch)
+            
+            self.snapshot.close()
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(self.path, old_path)
+            os.replace(tmp_path, self.path)
+            shutil.rmtree(old_path, ignore_errors=True)
+            self.snapshot = None
+            self._row_index = None
+            self._reopen()
+            
+            self.ann_index = None
+            if had_ann_index and self.snapshot.live_count():
+                self.build_ann_index()
+    
+    def ann_index_outgrown(self) -> bool:
+        """Whether live vectors exceed ANN_RETRAIN_GROWTH times the count the IVF centroids were trained on"""
+        if not self.ann_index:
+            return False
+        return self.count() > Config.ANN_RETRAIN_GROWTH * max(self.ann_index.trained_count, 1)
+    
+    def build_ann_index(self, nlist: int = None) -> IVFIndex:
+        """
+        Train (or retrain) the IVF index over the current snapshot
+        
+        Holds the writer lock while training, so appends and deletes from
+        other processes wait until the index is saved.
+        """
+        with snapshot_lock(self.path):
+            self._reopen()
+            if not self.snapshot:
+                raise ValueError(f"No snapshot at {self.path}")
+            self.ann_index = IVFIndex.train(
+                self.path,
+                self.snapshot.vectors,
+                nlist=nlist or Config.ANN_NLIST or None,
+                live_mask=self.snapshot.live_mask,
+                snapshot_id=self.snapshot.manifest.get("id"),
+            )
+        return self.ann_index
+    
+    def search_rows(self, embedding, k: int = 4, nprobe: int = None, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest rows to an embedding
+        
+        Args:
+            embedding: Query vector
+            k: Number of results
+            nprobe: IVF lists to scan (defaults to Config.ANN_NPROBE)
+            exact: Force brute-force search even if an ANN index exists
+            
+        Returns:
+            (rows, cosine scores), best first
+        """
+        if not self.count():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query) or 1.0
+        
+        if self.ann_index and not exact:
+            rows = self.ann_index.candidates(query, nprobe or Config.ANN_NPROBE)
+            # Rows deleted by another process may still be listed
+            rows = rows[self.snapshot.live_mask[rows]]
+            vectors = self.snapshot.vectors[rows]
+            norms = self.snapshot.norms[rows]
+        else:
+            rows = np.flatnonzero(self.snapshot.live_mask)
+            vectors = self.snapshot.vectors if len(rows) == self.snapshot.count else self.snapshot.vectors[rows]
+            norms = self.snapshot.norms[rows]
+        
+        if not len(rows):
+            return rows, np.zeros(0, dtype=np.float32)
+        
+        norms = np.where(norms == 0, 1.0, norms)
+        scores = (vectors @ query) / (norms * query_norm)
+        
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+    
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the k nearest chunks to an embedding with cosine scores"""
+        rows, scores = self.search_rows(embedding, k, nprobe=kwargs.get("nprobe"), exact=kwargs.get("exact", False))
+        
+        results = []
+        for row, score in zip(rows, scores):
+            vector_id, text, metadata = self.snapshot.get(int(row))
+            metadata = {**metadata, "id": vector_id, "score": float(score)}
+            results.append((Document(page_content=text, metadata=metadata), float(score)))
+        return results
+    
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, **kwargs)
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+    
+    def _select_relevance_score_fn(self):
+        # Cosine similarity is already in [-1, 1]; higher is more relevant
+        return lambda score: score
+    
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        path: str = "vectorstore",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, path)
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
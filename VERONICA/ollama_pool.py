@@ -0,0 +1,252 @@
+"""
+Load-balanced pool of Ollama backends
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, List, Optional
+import requests
+from langchain_community.llms import Ollama
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from config import Config
+
+
+class OllamaEndpoint:
+    """State for a single Ollama server in the pool"""
+    
+    def __init__(self, base_url: str, max_concurrency: int):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejections = 0  # request-failure ejections since the last success
+        self.ejected_until = 0.0  # monotonic time before which health checks may not re-admit
+        self.total_requests = 0
+        self.total_errors = 0
+        self.latencies = deque(maxlen=Config.OLLAMA_LATENCY_WINDOW)
+        self.llm = Ollama(
+            model=Config.OLLAMA_MODEL,
+            base_url=self.base_url,
+            temperature=0.7,
+        )
+    
+    def has_capacity(self) -> bool:
+        return self.healthy and self.in_flight < self.max_concurrency
+    
+    def stats(self) -> dict:
+        """Request counts and latency percentiles (seconds) for this endpoint"""
+        latencies = sorted(self.latencies)
+        
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+        
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.total_requests,
+            "errors": self.total_errors,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99),
+        }
+
+
+class OllamaPool:
+    """
+    Route requests to the least-loaded healthy Ollama endpoint
+    
+    Each endpoint has a concurrency limit; callers block until a slot frees
+    up. Endpoints are ejected after repeated failures and re-admitted once a
+    background health check against /api/tags succeeds again. An endpoint
+    ejected for failed requests (which /api/tags may not reveal) is only
+    re-admitted after a backoff that doubles each time it is ejected again.
+    """
+    
+    def __init__(self, base_urls: List[str], max_concurrency: int = None,
+                 health_check_interval: float = None, failure_threshold: int = None,
+                 eject_backoff: float = None):
+        if not base_urls:
+            raise ValueError("At least one Ollama endpoint is required")
+        
+        max_concurrency = max_concurrency or Config.OLLAMA_MAX_CONCURRENCY
+        self.endpoints = [OllamaEndpoint(url, max_concurrency) for url in base_urls]
+        self.health_check_interval = health_check_interval or Config.OLLAMA_HEALTH_CHECK_INTERVAL
+        self.failure_threshold = failure_threshold or Config.OLLAMA_FAILURE_THRESHOLD
+        self.eject_backoff = eject_backoff if eject_backoff is not None else Config.OLLAMA_EJECT_BACKOFF
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self._health_thread.start()
+    
+    def _pick(self, exclude=()) -> Optional[OllamaEndpoint]:
+        candidates = [ep for ep in self.endpoints if ep.has_capacity() and ep not in exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda ep: (ep.in_flight, ep.total_requests))
+    
+    def acquire(self, timeout: float = None, exclude=()) -> OllamaEndpoint:
+        """
+        Reserve a slot on the endpoint with the fewest in-flight requests
+        
+        Args:
+            timeout: Seconds to wait for a free slot (None waits forever)
+            exclude: Endpoints not to use (e.g. one that just failed)
+        
+        Returns:
+            The reserved OllamaEndpoint
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                endpoint = self._pick(exclude)
+                if endpoint:
+                    endpoint.in_flight += 1
+                    endpoint.total_requests += 1
+                    return endpoint
+                
+                if not self.has_healthy(exclude):
+                    raise Exception("No healthy Ollama endpoints available")
+                
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free Ollama endpoint")
+                self._cond.wait(remaining)
+    
+    def release(self, endpoint: OllamaEndpoint, latency: float, success: bool):
+        """Return a slot and record the outcome of the request"""
+        with self._cond:
+            endpoint.in_flight -= 1
+            if success:
+                endpoint.consecutive_failures = 0
+                endpoint.ejections = 0
+                endpoint.latencies.append(latency)
+            else:
+                endpoint.total_errors += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold and endpoint.healthy:
+                    backoff = min(self.eject_backoff * 2 ** endpoint.ejections, Config.OLLAMA_EJECT_BACKOFF_MAX)
+                    print(f"Ejecting unhealthy Ollama endpoint for {backoff:.0f}s: {endpoint.base_url}")
+                    endpoint.healthy = False
+                    endpoint.ejections += 1
+                    endpoint.ejected_until = time.monotonic() + backoff
+            self._cond.notify_all()
+    
+    def has_healthy(self, exclude=()) -> bool:
+        """Whether any healthy endpoint outside `exclude` exists"""
+        return any(ep.healthy and ep not in exclude for ep in self.endpoints)
+    
+    @contextmanager
+    def endpoint(self, timeout: float = None, exclude=()):
+        """Context manager that acquires and releases an endpoint"""
+        endpoint = self.acquire(timeout, exclude)
+        start = time.perf_counter()
+        success = False
+        try:
+            yield endpoint
+            success = True
+        finally:
+            self.release(endpoint, time.perf_counter() - start, success)
+    
+    def check_health(self, endpoint: OllamaEndpoint) -> bool:
+        """Ping an endpoint and eject or re-admit it accordingly"""
+        try:
+            response = requests.get(f"{endpoint.base_url}/api/tags", timeout=Config.OLLAMA_HEALTH_CHECK_TIMEOUT)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        
+        with self._cond:
+            if ok and not endpoint.healthy and time.monotonic() < endpoint.ejected_until:
+                # Ejected for failed requests: /api/tags answering does not prove it recovered
+                return False
+            if ok and not endpoint.healthy:
+                print(f"Re-admitting Ollama endpoint: {endpoint.base_url}")
+                endpoint.consecutive_failures = 0
+            elif not ok and endpoint.healthy:
+                print(f"Ejecting unhealthy Ollama endpoint: {endpoint.base_url}")
+            endpoint.healthy = ok
+            self._cond.notify_all()
+        return ok
+    
+    def _health_loop(self):
+        while not self._stop.is_set():
+            for endpoint in self.endpoints:
+                if self._stop.is_set():
+                    return
+                self.check_health(endpoint)
+            self._stop.wait(self.health_check_interval)
+    
+    def stats(self) -> List[dict]:
+        """Per-endpoint health, load and latency statistics"""
+        with self._cond:
+            return [ep.stats() for ep in self.endpoints]
+    
+    def close(self):
+        """Stop the background health checker and wait for it to exit"""
+        self._stop.set()
+        if self._health_thread is not threading.current_thread():
+            self._health_thread.join(Config.OLLAMA_HEALTH_CHECK_TIMEOUT + 1)
+
+
+_shared_pools = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_shared_pool(base_urls: List[str]) -> OllamaPool:
+    """
+    Process-wide pool for a list of Ollama servers
+    
+    Streamlit creates an LLMManager per session; borrowing one pool per
+    process makes in-flight counts and OLLAMA_MAX_CONCURRENCY apply per
+    server across all sessions, and runs a single health-check thread.
+    
+    Args:
+        base_urls: Ollama server URLs
+        
+    Returns:
+        The shared OllamaPool for these URLs
+    """
+    key = tuple(url.rstrip("/") for url in base_urls)
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = _shared_pools[key] = OllamaPool(list(key))
+        return pool
+
+
+class PooledOllama(LLM):
+    """LangChain LLM that dispatches each call through an OllamaPool"""
+    
+    pool: Any
+    timeout: Optional[float] = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+    
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        # A failed call is retried once on a different endpoint
+        tried = set()
+        for attempt in range(2):
+            try:
+                with self.pool.endpoint(self.timeout, exclude=tried) as endpoint:
+                    tried.add(endpoint)
+                    return endpoint.llm.invoke(prompt, stop=stop, **kwargs)
+            except Exception as e:
+                if attempt or not tried or not self.pool.has_healthy(tried):
+                    raise
+                print(f"Ollama call failed, retrying on another endpoint: {str(e)}")
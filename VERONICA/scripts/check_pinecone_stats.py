@@ -1,6 +1,6 @@
 from dotenv import load_dotenv
 import os
-import pinecone
+from pinecone import Pinecone
 
 # Resolve project root and .env path reliably even when script is run from different cwd
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,9 +25,9 @@ if not API_KEY or not ENV:
     print("  PINECONE_ENVIRONMENT=", bool(os.getenv("PINECONE_ENVIRONMENT")))
     raise SystemExit("Set PINECONE_API_KEY and PINECONE_ENVIRONMENT in .env (check path)")
 
-pinecone.init(api_key=API_KEY, environment=ENV)
+pc = Pinecone(api_key=API_KEY)
 if not INDEX_NAME:
     print("Set PINECONE_INDEX_NAME in .env to see stats for a specific index.")
 else:
-    idx = pinecone.Index(INDEX_NAME)
+    idx = pc.Index(INDEX_NAME)
     print("Index stats:", idx.describe_index_stats())
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Run the shared embedding service
+
+Usage (PowerShell):
+    python scripts\embedding_server.py --address tcp://127.0.0.1:8765
+    python scripts\embedding_server.py --address tcp://127.0.0.1:8765 --stats
+
+Usage (Linux/macOS):
+    python scripts/embedding_server.py                 # listens on Config.EMBEDDING_SERVICE_ADDRESS (Unix socket)
+    python scripts/embedding_server.py --stats         # print queue depth and batch-size metrics
+
+What it does:
+- Loads Config.EMBEDDING_MODEL once
+- Coalesces concurrent embedding requests into micro-batches (up to --max-batch-size texts, waiting at most --max-wait-ms)
+- VectorStoreManager picks the service up automatically when EMBEDDING_SERVICE_ADDRESS points at a running server
+"""
+import os
+import argparse
+import asyncio
+import json
+
+# Ensure we can import project modules (script lives in VERONICA/scripts)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+import sys
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from config import Config
+from embedding_service import EmbeddingClient, EmbeddingServer
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Run the shared embedding service")
+    p.add_argument("--address", "-a", default=Config.EMBEDDING_SERVICE_ADDRESS, help="Unix socket path or tcp://host:port")
+    p.add_argument("--max-batch-size", type=int, default=Config.EMBEDDING_MAX_BATCH_SIZE, help="Maximum texts per model call")
+    p.add_argument("--max-wait-ms", type=float, default=Config.EMBEDDING_MAX_WAIT_MS, help="Micro-batching window in milliseconds")
+    p.add_argument("--stats", action="store_true", help="Print metrics from a running server and exit")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.stats:
+        print(json.dumps(EmbeddingClient(args.address).stats(), indent=2))
+        return
+
+    server = EmbeddingServer(args.address, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("Embedding service stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Measure ANN recall and latency on a local snapshot
+
+Usage (PowerShell):
+    python scripts\\evaluate_ann.py --snapshot vectorstore\\local --queries 200 --k 4 --nprobe 1,4,8,16,32
+
+What it does:
+- Opens the snapshot with the local backend and builds the IVF index if none exists, it has outgrown its
+  centroids (ANN_RETRAIN_GROWTH) or --retrain is given; the app only searches exactly until it is built
+- Samples stored vectors as queries, leaving each query's own row out of the exact and IVF results
+  (it would always be found, inflating recall), or embeds held-out texts given with --query-file
+- Runs exact search and IVF search for every nprobe setting on the same queries
+- Prints recall@k against exact search together with p50/p99 latency, so ANN_NPROBE can be picked from measurements
+"""
+import os
+import argparse
+import time
+import numpy as np
+
+# Ensure we can import project modules (script lives in VERONICA/scripts)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+import sys
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ann_index import evaluate_recall
+from config import Config
+from local_vector_store import LocalVectorStore
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Evaluate IVF recall@k and latency against exact search")
+    p.add_argument("--snapshot", "-s", default=Config.LOCAL_INDEX_DIR, help="Snapshot directory")
+    p.add_argument("--queries", "-n", type=int, default=200, help="Number of stored vectors to use as queries")
+    p.add_argument("--query-file", help="Text file with one held-out query per line (embedded with the snapshot's model)")
+    p.add_argument("--k", type=int, default=4, help="Neighbours per query")
+    p.add_argument("--nprobe", default="1,2,4,8,16,32", help="Comma-separated nprobe values")
+    p.add_argument("--nlist", type=int, default=Config.ANN_NLIST or None, help="Lists when (re)training the index")
+    p.add_argument("--retrain", action="store_true", help="Retrain the IVF index before evaluating")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # No embedding model is needed unless --query-file is given
+    store = LocalVectorStore(None, args.snapshot, index_type="ivf")
+    if not store.count():
+        print(f"Error: no vectors found in {args.snapshot}")
+        return
+
+    if args.retrain or not store.ann_index or store.ann_index_outgrown():
+        if store.count() < Config.ANN_MIN_TRAIN_SIZE:
+            print(f"Error: {store.count()} vectors, at least {Config.ANN_MIN_TRAIN_SIZE} are needed to train an IVF index")
+            return
+        start = time.perf_counter()
+        store.build_ann_index(nlist=args.nlist)
+        print(f"Trained IVF index with {store.ann_index.nlist} lists in {time.perf_counter() - start:.1f}s")
+
+    if args.query_file:
+        # Imported here so stored-vector runs don't need to load the embedding model
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        with open(args.query_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        model_name = store.snapshot.manifest.get("embedding_model", Config.EMBEDDING_MODEL)
+        queries = np.asarray(HuggingFaceEmbeddings(model_name=model_name).embed_documents(texts), dtype=np.float32)
+        query_rows = None
+    else:
+        rng = np.random.default_rng(0)
+        live_rows = np.flatnonzero(store.snapshot.live_mask)
+        query_rows = np.sort(rng.choice(live_rows, size=min(args.queries, len(live_rows)), replace=False))
+        queries = np.asarray(store.snapshot.vectors[query_rows])
+
+    nprobe_values = [int(v) for v in args.nprobe.split(",") if v.strip()]
+    print(f"{store.count()} vectors, {len(queries)} queries, k={args.k}, nlist={store.ann_index.nlist}")
+    print(f"{'setting':<12} {'recall@k':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for row in evaluate_recall(store, queries, k=args.k, nprobe_values=nprobe_values, query_rows=query_rows):
+        print(f"{row['setting']:<12} {row['recall']:>9.3f} {row['p50_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Minimal fake Ollama HTTP server for exercising the endpoint pool locally
+
+Usage (PowerShell):
+    python scripts\\fake_ollama_server.py --port 11501 --latency 0.5
+    python scripts\\fake_ollama_server.py --port 11502 --latency 1.0 --fail-rate 0.2
+
+Then point the app at both:
+    $env:OLLAMA_BASE_URLS="http://localhost:11501,http://localhost:11502"
+
+What it does:
+- Answers GET /api/tags (used by health checks) with a single fake model
+- Answers POST /api/generate with a streamed, Ollama-style JSON response after --latency seconds
+- Fails a fraction of requests (--fail-rate) with HTTP 500 to trigger ejection
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Run a fake Ollama server")
+    p.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    p.add_argument("--port", type=int, default=11500, help="Port to listen on")
+    p.add_argument("--latency", type=float, default=0.2, help="Seconds to wait before answering a generate request")
+    p.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of generate requests that return HTTP 500")
+    return p.parse_args()
+
+
+def make_handler(latency: float, fail_rate: float, name: str):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/api/tags":
+                self._send_json(200, {"models": [{"name": "fake:latest"}]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            # langchain's Ollama client posts to /api/generate/
+            if self.path.rstrip("/") != "/api/generate":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            time.sleep(latency)
+            if random.random() < fail_rate:
+                self._send_json(500, {"error": "simulated failure"})
+                return
+
+            answer = f"[{name}] echo: {request.get('prompt', '')[:80]}"
+            lines = [
+                {"model": request.get("model", "fake"), "response": answer, "done": False},
+                {"model": request.get("model", "fake"), "response": "", "done": True},
+            ]
+            body = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeOllamaHandler
+
+
+def main():
+    args = parse_args()
+    name = f"{args.host}:{args.port}"
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency, args.fail_rate, name))
+    print(f"Fake Ollama listening on http://{name}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
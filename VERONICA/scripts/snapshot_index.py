@@ -0,0 +1,124 @@
+"""
+Export and import vector index snapshots
+
+Usage (PowerShell):
+    # Dump the configured Pinecone index to a snapshot directory
+    python scripts\\snapshot_index.py dump --out snapshots\\notes
+
+    # Open a snapshot with the local backend (memory-mapped, nothing is copied)
+    python scripts\\snapshot_index.py load --snapshot snapshots\\notes --query "What is AI?"
+
+    # Bulk-restore a snapshot into a (new) Pinecone index
+    python scripts\\snapshot_index.py restore --snapshot snapshots\\notes --index notes-restored
+
+What it does:
+- dump: lists every vector ID in the index, fetches vectors + metadata in batches and streams them into
+  vectors.f32 / norms.f32 (flat float32, memory-mappable) and chunks.arrow (columnar text + metadata)
+- load: opens the snapshot in place with LocalVectorStore and reports cold-start time
+- restore: creates the target index if needed and upserts the snapshot in batches
+
+To serve a snapshot from the app, set VECTOR_STORE_BACKEND=local and LOCAL_INDEX_DIR=<snapshot dir>.
+"""
+import os
+import argparse
+import time
+from dotenv import load_dotenv
+
+# Ensure we can import project modules (script lives in VERONICA/scripts)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+import sys
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from pinecone import Pinecone, ServerlessSpec
+from config import Config
+from index_snapshot import Snapshot, export_pinecone, restore_pinecone
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Export and import vector index snapshots")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    dump = sub.add_parser("dump", help="Dump a Pinecone index to a snapshot")
+    dump.add_argument("--out", "-o", required=True, help="Snapshot directory to create")
+    dump.add_argument("--index", default=Config.PINECONE_INDEX_NAME, help="Pinecone index name")
+    dump.add_argument("--namespace", default="", help="Pinecone namespace")
+    dump.add_argument("--batch-size", type=int, default=100, help="Vectors fetched per request")
+
+    load = sub.add_parser("load", help="Open a snapshot with the local backend")
+    load.add_argument("--snapshot", "-s", required=True, help="Snapshot directory")
+    load.add_argument("--query", "-q", help="Optional query to run against the snapshot")
+    load.add_argument("--k", type=int, default=4, help="Number of results for --query")
+
+    restore = sub.add_parser("restore", help="Bulk-restore a snapshot into Pinecone")
+    restore.add_argument("--snapshot", "-s", required=True, help="Snapshot directory")
+    restore.add_argument("--index", default=Config.PINECONE_INDEX_NAME, help="Target Pinecone index name")
+    restore.add_argument("--namespace", default="", help="Target namespace")
+    restore.add_argument("--batch-size", type=int, default=100, help="Vectors per upsert request")
+    return p.parse_args()
+
+
+def get_pinecone() -> Pinecone:
+    if not Config.PINECONE_API_KEY:
+        raise SystemExit("Set PINECONE_API_KEY in .env")
+    return Pinecone(api_key=Config.PINECONE_API_KEY)
+
+
+def dump(args):
+    pc = get_pinecone()
+    index = pc.Index(args.index)
+    dimension = pc.describe_index(args.index).dimension
+
+    start = time.perf_counter()
+    count = export_pinecone(index, args.out, dimension, namespace=args.namespace, batch_size=args.batch_size)
+    print(f"Dumped {count} vectors from '{args.index}' to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+def load(args):
+    # Imported here so dump/restore don't need to load the embedding model
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from local_vector_store import LocalVectorStore
+
+    start = time.perf_counter()
+    snapshot = Snapshot(args.snapshot)
+    print(f"Opened snapshot: {len(snapshot)} vectors, dimension {snapshot.dimension} "
+          f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+    snapshot.close()
+
+    if args.query:
+        embeddings = HuggingFaceEmbeddings(model_name=snapshot.manifest.get("embedding_model", Config.EMBEDDING_MODEL))
+        store = LocalVectorStore(embeddings, args.snapshot)
+        for doc, score in store.similarity_search_with_score(args.query, k=args.k):
+            print(f"[{score:.3f}] {doc.metadata.get('source', 'Unknown')}: {doc.page_content[:120]!r}")
+
+    print(f"To serve it from the app set VECTOR_STORE_BACKEND=local and LOCAL_INDEX_DIR={os.path.abspath(args.snapshot)}")
+
+
+def restore(args):
+    pc = get_pinecone()
+    snapshot = Snapshot(args.snapshot)
+
+    if args.index not in pc.list_indexes().names():
+        print(f"Creating new Pinecone index: {args.index}")
+        pc.create_index(
+            name=args.index,
+            dimension=snapshot.dimension,
+            metric=snapshot.manifest.get("metric", "cosine"),
+            spec=ServerlessSpec(cloud="aws", region=Config.PINECONE_ENVIRONMENT)
+        )
+        while not pc.describe_index(args.index).status["ready"]:
+            time.sleep(1)
+
+    start = time.perf_counter()
+    count = restore_pinecone(pc.Index(args.index), snapshot, namespace=args.namespace, batch_size=args.batch_size)
+    print(f"Restored {count} vectors into '{args.index}' in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    load_dotenv()
+    args = parse_args()
+    {"dump": dump, "load": load, "restore": restore}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
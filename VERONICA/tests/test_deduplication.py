@@ -0,0 +1,86 @@
+"""
+ChunkDeduplicator persistence when several instances share one index
+"""
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from langchain.schema import Document
+from deduplication import ChunkDeduplicator
+
+
+TEXT_A = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi"
+TEXT_B = "one two three four five six seven eight nine ten eleven twelve thirteen fourteen"
+
+
+def chunk(text, source):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def test_instances_sharing_an_index_keep_ids_and_signatures_aligned(tmp_path):
+    a, b = ChunkDeduplicator(str(tmp_path)), ChunkDeduplicator(str(tmp_path))
+    a.deduplicate([chunk(TEXT_A, "a.pdf")], ["A1"])
+    a.save()
+    b.deduplicate([chunk(TEXT_B, "b.pdf")], ["B1"])
+    b.save()
+
+    reloaded = ChunkDeduplicator(str(tmp_path))
+    assert reloaded.ids == ["A1", "B1"]
+
+    _, _, merged, _ = reloaded.deduplicate([chunk(TEXT_A, "a2.pdf")], ["new-a"])
+    assert merged == {"A1": ["a.pdf", "a2.pdf"]}
+    _, _, merged, _ = reloaded.deduplicate([chunk(TEXT_B, "b2.pdf")], ["new-b"])
+    assert merged == {"B1": ["b.pdf", "b2.pdf"]}
+
+
+def test_records_saved_by_other_instances_are_picked_up(tmp_path):
+    a, b = ChunkDeduplicator(str(tmp_path)), ChunkDeduplicator(str(tmp_path))
+    b.deduplicate([chunk(TEXT_B, "b.pdf")], ["B1"])
+    b.save()
+
+    docs, _, merged, report = a.deduplicate([chunk(TEXT_B, "copy.pdf")], ["X"])
+    assert docs == []
+    assert merged == {"B1": ["b.pdf", "copy.pdf"]}
+    assert report["duplicates_of_existing"] == 1
+
+
+def test_discard_forgets_unsaved_chunks(tmp_path):
+    dedup = ChunkDeduplicator(str(tmp_path))
+    dedup.deduplicate([chunk(TEXT_A, "a.pdf")], ["A1"])
+    dedup.discard()
+
+    docs, _, _, _ = dedup.deduplicate([chunk(TEXT_A, "a.pdf")], ["A2"])
+    assert len(docs) == 1
+
+
+def test_removed_chunks_can_be_added_again(tmp_path):
+    dedup = ChunkDeduplicator(str(tmp_path))
+    dedup.deduplicate([chunk(TEXT_A, "a.pdf")], ["A1"])
+    dedup.save()
+    dedup.remove(["A1"])
+
+    for instance in (dedup, ChunkDeduplicator(str(tmp_path))):
+        docs, _, merged, _ = instance.deduplicate([chunk(TEXT_A, "a.pdf")], ["A2"])
+        assert len(docs) == 1
+        assert merged == {}
+
+
+def test_matches_against_vectors_missing_from_the_store_are_kept(tmp_path):
+    dedup = ChunkDeduplicator(str(tmp_path))
+    dedup.deduplicate([chunk(TEXT_A, "a.pdf")], ["A1"])
+    dedup.save()
+
+    checked = []
+
+    def exists(ids):
+        checked.append(ids)
+        return set()
+
+    docs, ids, merged, report = dedup.deduplicate([chunk(TEXT_A, "a.pdf")], ["A2"], exists=exists)
+    assert checked == [["A1"]]
+    assert ids == ["A2"]
+    assert merged == {}
+    assert report["duplicates_of_existing"] == 0
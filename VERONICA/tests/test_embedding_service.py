@@ -0,0 +1,115 @@
+"""
+EmbeddingServer and EmbeddingClient over a Unix socket with a fake model
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from embedding_service import EmbeddingClient, EmbeddingServer
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets not available")
+
+
+class FakeModel:
+    """Embeds a text as [len(text), 1.0] after a fixed delay per text"""
+
+    def __init__(self, seconds_per_text: float = 0.0):
+        self.seconds_per_text = seconds_per_text
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        time.sleep(self.seconds_per_text * len(texts))
+        self.embedded += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def start_server(tmp_path):
+    running = []
+
+    def start(model, **kwargs):
+        server = EmbeddingServer(str(tmp_path / f"embed-{len(running)}.sock"), model_name="fake", **kwargs)
+        server.model = model
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(server.serve())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        deadline = time.time() + 5
+        while not EmbeddingClient.is_available(server.address):
+            assert time.time() < deadline, "embedding server did not start"
+            time.sleep(0.01)
+        running.append((loop, task, thread))
+        return server
+
+    yield start
+    for loop, task, thread in running:
+        async def stop():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        # Let serve() finish cancelling its batcher before the loop stops
+        asyncio.run_coroutine_threadsafe(stop(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+def test_embeds_texts_in_order(start_server):
+    server = start_server(FakeModel())
+    client = EmbeddingClient(server.address)
+
+    assert client.embed_documents(["a", "bbb", "cc"]) == [[1.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+    assert client.embed_query("dddd") == [4.0, 1.0]
+    assert client.embed_documents([]) == []
+
+
+def test_timed_out_request_is_not_resent(start_server):
+    model = FakeModel(seconds_per_text=0.002)
+    server = start_server(model, max_batch_size=100)
+    client = EmbeddingClient(server.address, timeout=0.2)
+
+    with pytest.raises(OSError):
+        # 200 texts take about 0.4s to embed, longer than the 0.2s timeout
+        client._request({"op": "embed", "texts": ["x"] * 200}, binary_reply=True, timeout=0.2)
+
+    time.sleep(0.6)
+    assert server.texts == 200
+    assert model.embedded <= 200
+
+
+def test_small_requests_are_batched_ahead_of_bulk(start_server):
+    model = FakeModel(seconds_per_text=0.002)
+    server = start_server(model, max_batch_size=50, max_wait_ms=1)
+    bulk_client = EmbeddingClient(server.address)
+    bulk = threading.Thread(target=bulk_client.embed_documents, args=(["x"] * 1000,))
+    bulk.start()
+    time.sleep(0.1)
+
+    # The bulk request needs about 2s; a query only waits for the current batch
+    start = time.time()
+    assert EmbeddingClient(server.address).embed_query("dddd") == [4.0, 1.0]
+    assert time.time() - start < 0.5
+    assert bulk.is_alive()
+    bulk.join(10)
+
+
+def test_disconnected_client_texts_are_not_embedded(start_server):
+    model = FakeModel(seconds_per_text=0.002)
+    server = start_server(model, max_batch_size=50, max_wait_ms=1)
+    client = EmbeddingClient(server.address)
+
+    with pytest.raises(OSError):
+        # The client closes its connection when the request times out
+        client._request({"op": "embed", "texts": ["x"] * 1000}, binary_reply=True, timeout=0.1)
+
+    time.sleep(0.5)
+    assert server.cancelled_texts > 0
+    assert model.embedded < 500
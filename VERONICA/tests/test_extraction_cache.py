@@ -0,0 +1,48 @@
+"""
+ExtractionCache hits, misses and damaged entries
+"""
+import os
+import sys
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from extraction_cache import ExtractionCache
+
+
+PAGES = [f"page {i} " * 200 for i in range(5)]
+
+
+def test_round_trip(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024 * 1024)
+    assert cache.get("hash", "pypdf", "1.0") is None
+    cache.put("hash", "pypdf", "1.0", PAGES)
+
+    assert cache.get("hash", "pypdf", "1.0") == PAGES
+    assert cache.get("hash", "pypdf", "2.0") is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("damage", ["truncate", "corrupt"])
+def test_damaged_entry_is_a_miss_and_removed(tmp_path, damage):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024 * 1024)
+    cache.put("hash", "pypdf", "1.0", PAGES)
+    path = cache._path("hash", "pypdf", "1.0")
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if damage == "truncate":
+        data = data[:len(data) // 2]
+    else:
+        # Keep the gzip header, scramble the deflate stream
+        data = data[:10] + bytes(b ^ 0xFF for b in data[10:])
+    with open(path, "wb") as f:
+        f.write(data)
+
+    assert cache.get("hash", "pypdf", "1.0") is None
+    assert not os.path.exists(path)
+
+    cache.put("hash", "pypdf", "1.0", PAGES)
+    assert cache.get("hash", "pypdf", "1.0") == PAGES
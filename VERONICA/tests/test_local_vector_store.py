@@ -0,0 +1,198 @@
+"""
+LocalVectorStore and index snapshots shared between instances
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+import numpy as np
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from langchain_core.embeddings import Embeddings
+from ann_index import evaluate_recall
+from index_snapshot import VECTORS_FILE, Snapshot, SnapshotWriter, append_to_snapshot
+from local_vector_store import LocalVectorStore
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic pseudo-random unit vectors keyed by text"""
+
+    def __init__(self, dimension: int = 16):
+        self.dimension = dimension
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = np.random.default_rng(abs(hash(text)) % (2 ** 32)).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+
+def top_id(store, text):
+    return store.similarity_search(text, k=1)[0].metadata["id"]
+
+
+def append_rows(path, prefix, batches):
+    embeddings = FakeEmbeddings()
+    for b in range(batches):
+        texts = [f"{prefix}-{b}-{i}" for i in range(5)]
+        append_to_snapshot(path, texts, embeddings.embed_documents(texts), texts, [{} for _ in texts])
+
+
+def test_changes_from_another_instance_are_seen_before_search(tmp_path):
+    path = str(tmp_path / "index")
+    embeddings = FakeEmbeddings()
+    writer, reader = LocalVectorStore(embeddings, path), LocalVectorStore(embeddings, path)
+    assert reader.count() == 0
+
+    writer.add_texts(["alpha", "beta", "gamma"], ids=["a", "b", "c"])
+    assert reader.count() == 3
+    assert top_id(reader, "beta") == "b"
+
+    writer.delete(["b"])
+    assert reader.count() == 2
+    assert top_id(reader, "beta") != "b"
+
+    # Compaction renumbers rows; appends after it must not reuse stale row numbers
+    writer.compact()
+    writer.add_texts(["delta", "epsilon"], ids=["d", "e"])
+    assert reader.count() == 4
+    assert set(reader.get_by_ids(["a", "c", "d", "e"])) == {"a", "c", "d", "e"}
+    assert top_id(reader, "epsilon") == "e"
+
+
+def test_failed_writer_leaves_no_snapshot(tmp_path):
+    path = str(tmp_path / "index")
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(path, 4) as writer:
+            writer.add(["a"], np.ones((1, 4)), ["alpha"], [{}])
+            raise RuntimeError("export failed")
+
+    assert not Snapshot.exists(path)
+    assert not os.path.exists(path)
+
+
+def test_concurrent_appends_keep_rows_aligned(tmp_path):
+    path = str(tmp_path / "index")
+    append_rows(path, "seed", 1)
+    workers = [multiprocessing.Process(target=append_rows, args=(path, f"p{n}", 20)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    snapshot = Snapshot(path)
+    assert snapshot.count == 5 + 4 * 20 * 5
+    # Every row's vector still belongs to its chunk
+    embeddings = FakeEmbeddings()
+    for row in range(snapshot.count):
+        vector_id, text, _ = snapshot.get(row)
+        assert vector_id == text
+        assert np.allclose(snapshot.vectors[row], embeddings.embed_query(text), atol=1e-6)
+    snapshot.close()
+
+
+def test_append_discards_bytes_of_a_crashed_append(tmp_path):
+    path = str(tmp_path / "index")
+    store = LocalVectorStore(FakeEmbeddings(), path)
+    store.add_texts(["alpha", "beta"], ids=["a", "b"])
+    store.snapshot.close()
+    # Vectors written by an append that died before its manifest
+    with open(os.path.join(path, VECTORS_FILE), "ab") as f:
+        f.write(b"\xff" * 100)
+
+    store = LocalVectorStore(FakeEmbeddings(), path)
+    store.add_texts(["gamma"], ids=["c"])
+    assert store.count() == 3
+    assert top_id(store, "gamma") == "c"
+    assert os.path.getsize(os.path.join(path, VECTORS_FILE)) == 3 * 16 * 4
+
+
+def test_delete_update_and_compact(tmp_path):
+    path = str(tmp_path / "index")
+    store = LocalVectorStore(FakeEmbeddings(), path)
+    store.add_texts(["alpha", "beta", "gamma"], metadatas=[{"n": 1}, {"n": 2}, {"n": 3}], ids=["a", "b", "c"])
+
+    assert store.delete(["b", "missing"])
+    assert not store.delete(["b"])
+    assert store.update_metadata({"c": {"tag": "x"}}) == 1
+    assert store.get_by_ids(["c"])["c"].metadata == {"n": 3, "tag": "x", "id": "c"}
+    assert store.snapshot.count == 4
+
+    store.compact()
+    assert store.snapshot.count == 2
+    assert store.count() == 2
+    assert set(store.get_by_ids(["a", "b", "c"])) == {"a", "c"}
+    assert top_id(store, "gamma") == "c"
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_ivf_index_is_only_built_explicitly_and_kept_in_sync(tmp_path):
+    path = str(tmp_path / "index")
+    texts = [f"chunk {i}" for i in range(600)]
+    store = LocalVectorStore(FakeEmbeddings(), path, index_type="ivf")
+    store.add_texts(texts, ids=texts)
+    assert store.ann_index is None
+    assert top_id(store, "chunk 7") == "chunk 7"
+
+    index = store.build_ann_index(nlist=8)
+    assert len(index.assignments) == 600
+    assert index.snapshot_id == store.snapshot.manifest["id"]
+
+    # Appends are assigned to the existing lists, deletes dropped from them
+    other = LocalVectorStore(FakeEmbeddings(), path, index_type="ivf")
+    other.add_texts(["late"], ids=["late"])
+    other.delete(["chunk 3"])
+    assert store.count() == 600
+    assert len(store.ann_index.assignments) == 601
+    assert store.ann_index.assignments[3] == -1
+    assert store.ann_index.trained_count == 600
+    assert "chunk 3" not in {doc.metadata["id"] for doc in store.similarity_search("chunk 3", k=10, nprobe=8)}
+
+    # Compaction renumbers rows and rebuilds the index for the new snapshot
+    other.compact()
+    assert other.ann_index.snapshot_id == other.snapshot.manifest["id"]
+    assert len(other.ann_index.assignments) == 600
+    assert store.count() == 600
+    assert store.ann_index.snapshot_id == other.snapshot.manifest["id"]
+    assert top_id(store, "late") == "late"
+
+
+def test_ivf_index_of_a_rewritten_snapshot_is_not_used(tmp_path):
+    path = str(tmp_path / "index")
+    store = LocalVectorStore(FakeEmbeddings(), path, index_type="ivf")
+    store.add_texts([f"chunk {i}" for i in range(100)])
+    store.build_ann_index(nlist=4)
+
+    stale_index = str(tmp_path / "ivf")
+    shutil.copytree(os.path.join(path, "ivf"), stale_index)
+
+    # Rewritten (row numbers shift) with the old index put back in place
+    flat = LocalVectorStore(FakeEmbeddings(), path, index_type="flat")
+    flat.delete([flat.snapshot.get(0)[0]])
+    flat.compact()
+    shutil.copytree(stale_index, os.path.join(path, "ivf"))
+
+    reopened = LocalVectorStore(FakeEmbeddings(), path, index_type="ivf")
+    assert reopened.ann_index is None
+    assert reopened.count() == 99
+
+
+def test_recall_leaves_out_the_query_rows(tmp_path):
+    store = LocalVectorStore(FakeEmbeddings(), str(tmp_path / "index"), index_type="ivf")
+    store.add_texts([f"chunk {i}" for i in range(400)])
+    store.build_ann_index(nlist=16)
+    query_rows = np.arange(0, 400, 10)
+    queries = np.asarray(store.snapshot.vectors[query_rows])
+
+    # A stored vector always finds itself in its own list
+    with_self = evaluate_recall(store, queries, k=1, nprobe_values=[1])
+    assert with_self[1]["recall"] == 1.0
+    without_self = evaluate_recall(store, queries, k=1, nprobe_values=[1, 16], query_rows=query_rows)
+    assert without_self[1]["recall"] < 1.0
+    assert without_self[2]["recall"] == 1.0
@@ -0,0 +1,205 @@
+"""
+OllamaPool against local fake Ollama servers (scripts/fake_ollama_server.py)
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (PROJECT_ROOT, os.path.join(PROJECT_ROOT, "scripts")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fake_ollama_server import make_handler
+from ollama_pool import OllamaPool, PooledOllama, get_shared_pool
+
+
+class FakeOllama:
+    """Fake Ollama server on an ephemeral port that records peak concurrency"""
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0):
+        self.active = 0
+        self.peak = 0
+        self.generate_requests = 0
+        self._lock = threading.Lock()
+        fake = self
+        base_handler = make_handler(latency, fail_rate, "fake")
+
+        class CountingHandler(base_handler):
+            def do_POST(self):
+                with fake._lock:
+                    fake.active += 1
+                    fake.generate_requests += 1
+                    fake.peak = max(fake.peak, fake.active)
+                try:
+                    super().do_POST()
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**kwargs):
+        server = FakeOllama(**kwargs)
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.stop()
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(urls, **kwargs):
+        # Long interval: only the initial health check runs in the background
+        kwargs.setdefault("health_check_interval", 3600)
+        pool = OllamaPool(urls, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_routes_to_least_loaded_endpoint(servers, make_pool):
+    a, b = servers(), servers()
+    pool = make_pool([a.url, b.url], max_concurrency=2)
+
+    first = pool.acquire()
+    second = pool.acquire()
+    assert {first.base_url, second.base_url} == {a.url, b.url}
+
+    # The endpoint that frees up first gets the next request
+    pool.release(first, 0.01, success=True)
+    third = pool.acquire()
+    assert third is first
+    pool.release(second, 0.01, success=True)
+    pool.release(third, 0.01, success=True)
+
+
+def test_requests_are_spread_across_servers(servers, make_pool):
+    a, b = servers(latency=0.2), servers(latency=0.2)
+    pool = make_pool([a.url, b.url], max_concurrency=2)
+    llm = PooledOllama(pool=pool)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        answers = list(executor.map(llm.invoke, ["q1", "q2", "q3", "q4"]))
+
+    assert all("echo" in answer for answer in answers)
+    assert a.generate_requests == 2
+    assert b.generate_requests == 2
+
+
+def test_concurrency_cap_is_enforced(servers, make_pool):
+    a, b = servers(latency=0.1), servers(latency=0.1)
+    pool = make_pool([a.url, b.url], max_concurrency=1)
+    llm = PooledOllama(pool=pool)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(llm.invoke, [f"q{i}" for i in range(6)]))
+
+    assert a.peak == 1
+    assert b.peak == 1
+    assert a.generate_requests + b.generate_requests == 6
+
+    # With every slot taken, callers wait and then time out
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
+    for endpoint in held:
+        pool.release(endpoint, 0.01, success=True)
+
+
+def test_failed_calls_are_retried_on_another_endpoint(servers, make_pool):
+    good, bad = servers(), servers(fail_rate=1.0)
+    pool = make_pool([bad.url, good.url], max_concurrency=1, failure_threshold=2)
+    bad_endpoint = next(ep for ep in pool.endpoints if ep.base_url == bad.url)
+    llm = PooledOllama(pool=pool)
+
+    # Every call that lands on the failing server is retried on the good one
+    answers = [llm.invoke(f"q{i}") for i in range(4)]
+    assert all("echo" in answer for answer in answers)
+    assert bad.generate_requests == 2
+    assert not bad_endpoint.healthy
+    assert bad_endpoint.stats()["errors"] == 2
+
+    # Ejected endpoints receive no traffic
+    for i in range(3):
+        llm.invoke(f"q{i}")
+    assert bad.generate_requests == 2
+
+
+def test_call_fails_when_no_other_endpoint_is_left(servers, make_pool):
+    bad = servers(fail_rate=1.0)
+    pool = make_pool([bad.url], failure_threshold=5)
+    with pytest.raises(Exception):
+        PooledOllama(pool=pool).invoke("q")
+    assert bad.generate_requests == 1
+
+
+def test_request_failure_ejection_backs_off_before_readmission(servers, make_pool):
+    good, bad = servers(), servers(fail_rate=1.0)
+    pool = make_pool([bad.url, good.url], failure_threshold=1, eject_backoff=0.3)
+    bad_endpoint = next(ep for ep in pool.endpoints if ep.base_url == bad.url)
+
+    with pytest.raises(Exception):
+        with pool.endpoint(exclude={pool.endpoints[1]}) as endpoint:
+            endpoint.llm.invoke("q")
+    assert not bad_endpoint.healthy
+
+    # /api/tags answers, but the endpoint stays out until the backoff expires
+    assert not pool.check_health(bad_endpoint)
+    assert not bad_endpoint.healthy
+    time.sleep(0.35)
+    assert pool.check_health(bad_endpoint)
+    assert bad_endpoint.healthy
+
+    # Failing again doubles the backoff
+    with pytest.raises(Exception):
+        with pool.endpoint(exclude={pool.endpoints[1]}) as endpoint:
+            endpoint.llm.invoke("q")
+    time.sleep(0.35)
+    assert not pool.check_health(bad_endpoint)
+    time.sleep(0.3)
+    assert pool.check_health(bad_endpoint)
+
+
+def test_health_check_ejects_unreachable_server(servers, make_pool):
+    a, b = servers(), servers()
+    pool = make_pool([a.url, b.url])
+    endpoint = next(ep for ep in pool.endpoints if ep.base_url == b.url)
+
+    b.stop()
+    assert not pool.check_health(endpoint)
+    assert not endpoint.healthy
+
+
+def test_shared_pool_is_reused_per_url_list(servers):
+    a, b = servers(), servers()
+    pool = get_shared_pool([a.url, b.url])
+    try:
+        assert get_shared_pool([a.url + "/", b.url]) is pool
+        assert get_shared_pool([b.url, a.url]) is not pool
+    finally:
+        get_shared_pool([b.url, a.url]).close()
+        pool.close()
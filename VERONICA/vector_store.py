@@ -1,30 +1,69 @@
 """
-Vector store manager using Pinecone
+Vector store manager using Pinecone or a local snapshot index
 """
+import hashlib
+import os
 import time
-from typing import List
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Set
 from langchain.schema import Document
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Pinecone as LangchainPinecone
 from pinecone import Pinecone, ServerlessSpec
 from config import Config
+from deduplication import ChunkDeduplicator
+from embedding_service import EmbeddingClient
+from local_vector_store import LocalVectorStore
+
+
+class ScoredPinecone(LangchainPinecone):
+    """Pinecone store whose search results carry their similarity score in metadata"""
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "score": float(score)})
+            for doc, score in self.similarity_search_with_score(query, k=k, **kwargs)
+        ]
 
 
 class VectorStoreManager:
     """Manage vector store operations with Pinecone"""
     
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=Config.EMBEDDING_MODEL
-        )
+        if EmbeddingClient.is_available():
+            # Share the model loaded by the embedding service
+            self.embeddings = EmbeddingClient()
+            print(f"Using embedding service at {Config.EMBEDDING_SERVICE_ADDRESS}")
+        else:
+            self.embeddings = HuggingFaceEmbeddings(
+                model_name=Config.EMBEDDING_MODEL
+            )
         self.pc = None
         self.index = None
         self.vectorstore = None
+        self.deduplicator = ChunkDeduplicator(self._dedup_index_dir()) if Config.DEDUP_ENABLED else None
+        self.last_dedup_report = None
+        self._seconds_per_chunk = None
+        self._chunk_cache = OrderedDict()
         
+        if Config.VECTOR_STORE_BACKEND == "local":
+            # Open the local snapshot in place (memory-mapped)
+            self.vectorstore = LocalVectorStore(self.embeddings, Config.LOCAL_INDEX_DIR)
         # Initialize Pinecone if API key is available
-        if Config.PINECONE_API_KEY:
+        elif Config.PINECONE_API_KEY:
             self._initialize_pinecone()
     
+    @staticmethod
+    def _dedup_index_dir() -> str:
+        """Separate dedup index per vector index, so switching backends never drops chunks"""
+        if Config.VECTOR_STORE_BACKEND == "local":
+            path = os.path.abspath(Config.LOCAL_INDEX_DIR)
+            name = f"local-{os.path.basename(path)}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+        else:
+            name = f"pinecone-{Config.PINECONE_INDEX_NAME}"
+        return os.path.join(Config.DEDUP_INDEX_DIR, name)
+    
     def _initialize_pinecone(self):
         """Initialize Pinecone client and index"""
         try:
@@ -38,7 +77,7 @@ class VectorStoreManager:
                 print(f"Creating new Pinecone index: {index_name}")
                 self.pc.create_index(
                     name=index_name,
-                    dimension=384,  # Dimension for all-MiniLM-L6-v2
+                    dimension=Config.EMBEDDING_DIMENSION,
                     metric="cosine",
                     spec=ServerlessSpec(
                         cloud="aws",
@@ -59,6 +98,9 @@ class VectorStoreManager:
         """
         Add documents to the vector store
         
+        Near-duplicate chunks are dropped before embedding (see
+        ChunkDeduplicator); their sources are merged into the kept chunk.
+        
         Args:
             documents: List of LangChain Document objects
             
@@ -66,30 +108,150 @@ class VectorStoreManager:
             Success status
         """
         try:
-            if not self.pc:
+            if not isinstance(self.vectorstore, LocalVectorStore) and not self.pc:
                 raise Exception("Pinecone not initialized. Check your API key.")
             
-            # Create or update vectorstore
-            self.vectorstore = LangchainPinecone.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                index_name=Config.PINECONE_INDEX_NAME
-            )
+            ids = [str(uuid.uuid4()) for _ in documents]
+            # Record the vector ID on each chunk so chat history can reference it
+            documents = [
+                Document(page_content=doc.page_content, metadata={**doc.metadata, "chunk_id": chunk_id})
+                for doc, chunk_id in zip(documents, ids)
+            ]
+            merged_sources = {}
+            report = None
+            if self.deduplicator:
+                documents, ids, merged_sources, report = self.deduplicator.deduplicate(
+                    documents, ids, exists=self._existing_ids
+                )
+            
+            start = time.perf_counter()
+            if documents and isinstance(self.vectorstore, LocalVectorStore):
+                self.vectorstore.add_documents(documents, ids=ids)
+            elif documents:
+                # Create or update vectorstore
+                self.vectorstore = ScoredPinecone.from_documents(
+                    documents=documents,
+                    embedding=self.embeddings,
+                    index_name=Config.PINECONE_INDEX_NAME,
+                    ids=ids
+                )
+            if documents:
+                self._seconds_per_chunk = (time.perf_counter() - start) / len(documents)
+            
+            if merged_sources:
+                self._update_sources(merged_sources)
+            
+            if self.deduplicator:
+                self.deduplicator.save()
+                skipped = report["input_chunks"] - report["unique_chunks"]
+                # Estimated from this ingest's per-chunk embed + upsert time
+                report["embedding_seconds_saved"] = skipped * (self._seconds_per_chunk or 0.0)
+                self.last_dedup_report = report
+                if skipped:
+                    print(f"Skipped {skipped} duplicate chunks "
+                          f"(~{report['embedding_seconds_saved']:.1f}s of embedding saved)")
             
             print(f"Successfully added {len(documents)} document chunks to vector store")
             return True
             
         except Exception as e:
+            if self.deduplicator:
+                self.deduplicator.discard()
             print(f"Error adding documents to vector store: {str(e)}")
             raise
     
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+    def _existing_ids(self, ids: List[str]) -> Set[str]:
+        """IDs that are still stored in the vector index"""
+        if isinstance(self.vectorstore, LocalVectorStore):
+            return set(self.vectorstore.get_by_ids(ids))
+        found = set()
+        for start in range(0, len(ids), 100):
+            found.update(self.index.fetch(ids=ids[start:start + 100]).vectors)
+        return found
+    
+    def delete(self, ids: List[str]) -> bool:
+        """
+        Delete vectors by ID
+        
+        Args:
+            ids: Vector IDs
+            
+        Returns:
+            Success status
+        """
+        try:
+            if isinstance(self.vectorstore, LocalVectorStore):
+                self.vectorstore.delete(ids)
+            elif self.index:
+                self.index.delete(ids=ids)
+            else:
+                raise Exception("Pinecone not initialized. Check your API key.")
+        except Exception as e:
+            print(f"Error deleting vectors: {str(e)}")
+            return False
+        
+        if self.deduplicator:
+            self.deduplicator.remove(ids)
+        for chunk_id in ids:
+            self._chunk_cache.pop(chunk_id, None)
+        return True
+    
+    def _update_sources(self, merged_sources: Dict[str, List[str]]):
+        """Store merged source lists on vectors from earlier ingests"""
+        if isinstance(self.vectorstore, LocalVectorStore):
+            self.vectorstore.update_metadata({
+                vector_id: {"sources": sources} for vector_id, sources in merged_sources.items()
+            })
+        else:
+            for vector_id, sources in merged_sources.items():
+                self.index.update(id=vector_id, set_metadata={"sources": sources})
+    
+    def get_chunks(self, ids: List[str]) -> Dict[str, Document]:
+        """
+        Fetch stored chunks by vector ID
+        
+        Args:
+            ids: Vector IDs
+            
+        Returns:
+            Dictionary of ID to Document for the IDs that were found
+        """
+        missing = [chunk_id for chunk_id in ids if chunk_id not in self._chunk_cache]
+        try:
+            if missing and isinstance(self.vectorstore, LocalVectorStore):
+                fetched = self.vectorstore.get_by_ids(missing)
+            elif missing and self.index:
+                fetched = {}
+                for chunk_id, record in self.index.fetch(ids=missing).vectors.items():
+                    metadata = dict(record.metadata or {})
+                    fetched[chunk_id] = Document(page_content=metadata.pop("text", ""), metadata=metadata)
+            else:
+                fetched = {}
+        except Exception as e:
+            print(f"Error fetching chunks: {str(e)}")
+            fetched = {}
+        
+        for chunk_id, doc in fetched.items():
+            self._chunk_cache[chunk_id] = doc
+            while len(self._chunk_cache) > Config.CHUNK_CACHE_SIZE:
+                self._chunk_cache.popitem(last=False)
+        
+        found = {}
+        for chunk_id in ids:
+            if chunk_id in self._chunk_cache:
+                self._chunk_cache.move_to_end(chunk_id)
+                found[chunk_id] = self._chunk_cache[chunk_id]
+        return found
+    
+    def similarity_search(self, query: str, k: int = 4, nprobe: int = None, exact: bool = False) -> List[Document]:
         """
         Search for similar documents
         
         Args:
             query: Search query
             k: Number of results to return
+            nprobe: IVF lists to scan on the local backend (higher = better recall, slower)
+            exact: Force exact search on the local backend
             
         Returns:
             List of similar documents
@@ -97,11 +259,14 @@ class VectorStoreManager:
         try:
             if not self.vectorstore:
                 # Initialize vectorstore from existing index
-                self.vectorstore = LangchainPinecone.from_existing_index(
+                self.vectorstore = ScoredPinecone.from_existing_index(
                     index_name=Config.PINECONE_INDEX_NAME,
                     embedding=self.embeddings
                 )
             
+            if isinstance(self.vectorstore, LocalVectorStore):
+                return self.vectorstore.similarity_search(query, k=k, nprobe=nprobe, exact=exact)
+            
             results = self.vectorstore.similarity_search(query, k=k)
             return results
             
@@ -109,21 +274,29 @@ class VectorStoreManager:
             print(f"Error performing similarity search: {str(e)}")
             return []
     
-    def get_retriever(self, k: int = 4):
+    def get_retriever(self, k: int = 4, nprobe: int = None):
         """
         Get a retriever object for use in chains
         
         Args:
             k: Number of documents to retrieve
+            nprobe: IVF lists to scan on the local backend
             
         Returns:
             Retriever object
         """
         if not self.vectorstore:
             # Initialize vectorstore from existing index
-            self.vectorstore = LangchainPinecone.from_existing_index(
+            self.vectorstore = ScoredPinecone.from_existing_index(
                 index_name=Config.PINECONE_INDEX_NAME,
                 embedding=self.embeddings
             )
         
-        return self.vectorstore.as_retriever(search_kwargs={"k": k})
+        search_kwargs = {"k": k}
+        if isinstance(self.vectorstore, LocalVectorStore) and nprobe:
+            search_kwargs["nprobe"] = nprobe
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+    
+    def is_connected(self) -> bool:
+        """Whether a vector store backend is available"""
+        return self.pc is not None or isinstance(self.vectorstore, LocalVectorStore)